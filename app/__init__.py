@@ -14,17 +14,32 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'sqlite:///self_focus.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQL_INSTRUMENTATION_SAMPLE_RATE'] = float(os.environ.get('SQL_INSTRUMENTATION_SAMPLE_RATE', 1.0))
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'default')
     
+    from app import database
+    database.configure(app)
     db.init_app(app)
+    database.init_app(app)
+    
+    from app import instrumentation, cache
+    instrumentation.init_app(app)
+    cache.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
     
+    from app import identity, passwords
+    identity.init_app(app)
+    passwords.init_app(app)
+    
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import User
-        return User.query.get(user_id)
+        # Served from a short-lived identity cache; see app/identity.py
+        return identity.load_user(user_id)
     
     from app.routes.auth import auth_bp
     from app.routes.main import main_bp
@@ -40,6 +55,12 @@ def create_app():
     app.register_blueprint(habits_bp, url_prefix='/habits')
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    # Session listeners that keep denormalized tables in step with writes
+    from app import ledger, rollups, goal_progress, sync, habit_refresh
+    
+    from app.schema import schema_cli
+    app.cli.add_command(schema_cli)
+    
     return app
 
 def inject_navigation_helpers():
@@ -0,0 +1,122 @@
+"""Run many API writes in one request and one database transaction.
+
+``run(operations, mode)`` dispatches each ``{"method", "url", "body"}`` to the
+existing view function for that URL, in order, inside a nested request
+context that shares the caller's login. The views keep calling
+``db.session.commit()``; while a batch runs that only flushes, and the batch
+commits once at the end. Each operation runs in its own savepoint:
+
+* ``atomic`` (default): the first failing operation (an exception or a
+  status of 400 or more) rolls everything back; later operations are skipped.
+* ``best_effort``: a failing operation's savepoint is rolled back, the rest
+  are committed.
+
+Only the write endpoints in ``ENDPOINTS`` can be batched. A locked database
+is not retried per operation; the exception reaches the batch view, whose
+``retry_on_busy`` re-runs the whole batch.
+"""
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from werkzeug.exceptions import HTTPException
+from app import db
+
+MAX_OPERATIONS = 100
+MODES = ('atomic', 'best_effort')
+
+ENDPOINTS = {
+    'api.create_goal_api', 'api.update_goal_api', 'api.delete_goal_api',
+    'api.create_transaction_api', 'api.update_transaction_api', 'api.delete_transaction_api',
+    'api.create_habit_api', 'api.checkin_habit_api', 'api.batch_checkin_api',
+    'api.create_category_api',
+    'goals.update_status', 'goals.complete_milestone', 'goals.delete_milestone',
+    'habits.checkin_habit', 'habits.remove_checkin',
+}
+
+class InvalidBatch(ValueError):
+    pass
+
+def active():
+    """True while a batch is running in this session."""
+    return db.session.info.get('_batch', False)
+
+@contextmanager
+def _deferred_commits(session):
+    # Views commit on their own; inside a batch that must only flush so the
+    # batch can roll back or commit everything at once.
+    session.commit = session.flush
+    session.info['_batch'] = True
+    try:
+        yield
+    finally:
+        del session.commit
+        session.info.pop('_batch', None)
+
+def _validate(operations, mode):
+    if mode not in MODES:
+        raise InvalidBatch(f'mode must be one of: {", ".join(MODES)}')
+    if not isinstance(operations, list) or not operations:
+        raise InvalidBatch('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise InvalidBatch(f'At most {MAX_OPERATIONS} operations per batch')
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not isinstance(operation.get('url'), str):
+            raise InvalidBatch(f'Operation {index}: url is required')
+
+def _dispatch(operation):
+    """Run one operation through its view; returns ``(status, body)``."""
+    method = str(operation.get('method', 'POST')).upper()
+    with current_app.test_request_context(operation['url'], method=method,
+                                          json=operation.get('body') or {}) as context:
+        request = context.request
+        if request.routing_exception is not None:
+            return request.routing_exception.code, {'error': request.routing_exception.name}
+        if request.url_rule.endpoint not in ENDPOINTS:
+            return 400, {'error': 'This operation cannot be batched'}
+        try:
+            response = current_app.make_response(current_app.dispatch_request())
+        except HTTPException as error:
+            return error.code, {'error': error.name}
+        return response.status_code, response.get_json(silent=True)
+
+def run(operations, mode='atomic'):
+    """Execute ``operations`` in order and commit once.
+
+    Returns ``(committed, results)`` with one ``{index, status, body}`` per
+    operation; operations skipped after an atomic failure have status ``None``.
+    """
+    _validate(operations, mode)
+    session = db.session()
+    # pysqlite only opens a transaction before DML, and releasing a savepoint
+    # outside one would commit it; start the transaction explicitly.
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+
+    results = []
+    failed = False
+    with _deferred_commits(session):
+        for index, operation in enumerate(operations):
+            if failed and mode == 'atomic':
+                results.append({'index': index, 'status': None, 'body': None})
+                continue
+            savepoint = session.begin_nested()
+            try:
+                status, body = _dispatch(operation)
+            except OperationalError:
+                raise
+            except Exception as error:
+                current_app.logger.exception('Batch operation %d failed', index)
+                status, body = 500, {'error': str(error) or type(error).__name__}
+            results.append({'index': index, 'status': status, 'body': body})
+            if status >= 400:
+                failed = True
+                savepoint.rollback()
+            else:
+                savepoint.commit()
+
+    if failed and mode == 'atomic':
+        session.rollback()
+        return False, results
+    session.commit()
+    return True, results
@@ -0,0 +1,251 @@
+"""Per-user caching of computed view data with write-driven invalidation.
+
+Every user has a version token per data collection (``goals``,
+``milestones``, ``transactions``, ``categories``, ``habits``,
+``habit_logs``). A session hook records which users and collections each
+flush touched and replaces their tokens once the transaction commits, so no
+route has to invalidate anything itself. Cached values are stored under a key
+that includes the tokens of the collections they were computed from (and
+today's date), which makes stale entries unreachable; the backend's LRU
+eviction reclaims them.
+
+    stats = cache.cached('dashboard-stats', compute, user_id,
+                         depends_on=('transactions', 'goals'))
+
+Configuration (all optional):
+
+``RESPONSE_CACHE``               turn caching on/off (versions are kept either way)
+``RESPONSE_CACHE_BACKEND``       a ``CacheBackend`` instance, or ``'module:Class'``
+``RESPONSE_CACHE_MAX_ENTRIES``   size of the default in-process LRU
+
+The default ``LocalCache`` lives in the process. A shared store (Redis,
+memcached, ...) plugs in by implementing ``CacheBackend``; values passed to it
+must then be picklable. Treat returned values as read-only: the local backend
+hands out the cached objects themselves.
+"""
+from collections import OrderedDict
+from datetime import date
+import importlib
+import threading
+import uuid
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event, select
+from app import db
+
+COLLECTIONS = ('goals', 'milestones', 'transactions', 'categories', 'habits', 'habit_logs')
+
+class CacheBackend:
+    """Storage interface for the cache. Missing keys return ``None``."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def set_many(self, mapping):
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+class LocalCache(CacheBackend):
+    """Thread-safe in-process LRU holding at most ``max_entries`` values."""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class CacheMetrics:
+    def __init__(self):
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+    def record(self, namespace, hit):
+        counters = self.hits if hit else self.misses
+        with self._lock:
+            counters[namespace] = counters.get(namespace, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            namespaces = sorted(set(self.hits) | set(self.misses))
+            return {namespace: {'hits': self.hits.get(namespace, 0),
+                                'misses': self.misses.get(namespace, 0)}
+                    for namespace in namespaces}
+
+def _backend():
+    return current_app.extensions['response_cache']['backend']
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+def _version_key(user_id, collection):
+    return f'version:{user_id}:{collection}'
+
+def versions(user_id, collections=COLLECTIONS):
+    """Current version tokens of ``collections`` for a user, in order.
+
+    A token that is missing (never written, or evicted) is created on the spot,
+    so losing one can only cause misses, never stale hits.
+    """
+    backend = _backend()
+    keys = [_version_key(user_id, collection) for collection in collections]
+    tokens = backend.get_many(keys)
+    missing = {key: _new_token() for key, token in zip(keys, tokens) if token is None}
+    if missing:
+        backend.set_many(missing)
+        tokens = [token or missing[key] for key, token in zip(keys, tokens)]
+    return tokens
+
+def bump(user_id, collections=COLLECTIONS):
+    """Invalidate everything computed from ``collections`` for a user."""
+    _backend().set_many({_version_key(user_id, collection): _new_token()
+                         for collection in collections})
+
+def _count_lookup(hit):
+    if has_request_context():
+        counts = g.setdefault('_cache_lookups', [0, 0])
+        counts[0 if hit else 1] += 1
+
+def cached(namespace, compute, user_id, depends_on=COLLECTIONS, args=()):
+    """Return ``compute()``, reusing the stored result while ``depends_on`` is unchanged."""
+    state = current_app.extensions['response_cache']
+    if not current_app.config['RESPONSE_CACHE']:
+        return compute()
+
+    tokens = versions(user_id, depends_on)
+    key = f'{namespace}:{user_id}:{date.today().isoformat()}:{".".join(tokens)}:{args!r}'
+    value = state['backend'].get(key)
+    hit = value is not None
+    state['metrics'].record(namespace, hit)
+    _count_lookup(hit)
+    if not hit:
+        value = compute()
+        state['backend'].set(key, value)
+    return value
+
+def metrics():
+    """``{namespace: {'hits', 'misses'}}`` for this process, plus backend evictions."""
+    state = current_app.extensions['response_cache']
+    data = {'views': state['metrics'].as_dict()}
+    evictions = getattr(state['backend'], 'evictions', None)
+    if evictions is not None:
+        data['evictions'] = evictions
+    return data
+
+def mark_changed(session, user_id, *collections):
+    """Record a write the ORM hooks cannot see (e.g. Core bulk inserts)."""
+    changed = session.info.setdefault('_changed_collections', {})
+    changed.setdefault(user_id, set()).update(collections or COLLECTIONS)
+
+def _owners(session, model, ids):
+    if not ids:
+        return {}
+    rows = session.connection().execute(select(model.id, model.user_id).where(model.id.in_(list(ids))))
+    return dict(rows.all())
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changes(session, flush_context):
+    from app.models import User, Goal, Milestone, Transaction, Category, Habit, HabitLog
+
+    direct = {Goal: 'goals', Transaction: 'transactions', Category: 'categories', Habit: 'habits'}
+    # Deleting a goal or habit also removes its milestones or logs
+    children = {Goal: 'milestones', Habit: 'habit_logs'}
+    goal_ids, habit_ids = set(), set()
+
+    touched = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+    for obj in touched:
+        collection = direct.get(type(obj))
+        if collection is not None:
+            mark_changed(session, obj.user_id, collection)
+            if obj in session.deleted and type(obj) in children:
+                mark_changed(session, obj.user_id, children[type(obj)])
+        elif isinstance(obj, Milestone):
+            goal_ids.add(obj.goal_id)
+        elif isinstance(obj, HabitLog):
+            habit_ids.add(obj.habit_id)
+        elif isinstance(obj, User) and obj in session.deleted:
+            mark_changed(session, obj.id)
+
+    # Milestone writes also move the goal's counters and progress
+    for user_id in set(_owners(session, Goal, goal_ids).values()):
+        mark_changed(session, user_id, 'milestones', 'goals')
+    for user_id in set(_owners(session, Habit, habit_ids).values()):
+        mark_changed(session, user_id, 'habit_logs')
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_versions(session):
+    changed = session.info.pop('_changed_collections', None)
+    if changed and has_app_context():
+        for user_id, collections in changed.items():
+            bump(user_id, sorted(collections))
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    # A rolled back savepoint (see app/batch.py) leaves the outer writes pending
+    if not previous_transaction.nested:
+        session.info.pop('_changed_collections', None)
+
+def _report_lookups(response):
+    counts = g.pop('_cache_lookups', None)
+    if counts:
+        response.headers.add('Server-Timing', f'cache;desc="{counts[0]} hits, {counts[1]} misses"')
+    return response
+
+def _load_backend(app):
+    backend = app.config['RESPONSE_CACHE_BACKEND']
+    if backend is None:
+        return LocalCache(app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+    if isinstance(backend, str):
+        module_name, _, class_name = backend.partition(':')
+        return getattr(importlib.import_module(module_name), class_name)()
+    return backend
+
+def init_app(app):
+    app.config.setdefault('RESPONSE_CACHE', True)
+    app.config.setdefault('RESPONSE_CACHE_BACKEND', None)
+    app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 2048)
+
+    app.extensions['response_cache'] = {
+        'backend': _load_backend(app),
+        'metrics': CacheMetrics()
+    }
+    app.after_request(_report_lookups)
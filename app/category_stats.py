@@ -0,0 +1,49 @@
+"""Per-category transaction statistics computed with one grouped query."""
+from decimal import Decimal
+from sqlalchemy import func
+from app import db
+from app.models import Transaction, TransactionRollup, TransactionType
+
+def _empty():
+    return {'count': 0, 'income': Decimal('0'), 'expenses': Decimal('0')}
+
+def category_totals(user_id, category_ids=(), start_date=None, end_date=None, transaction_type=None):
+    """``{category_id: {'count', 'income', 'expenses'}}`` for a user's transactions.
+
+    Every id in ``category_ids`` is present (with zeros if it has no matching
+    transactions). ``start_date``/``end_date`` are inclusive. Without a date
+    range the totals come from the monthly rollups instead of the transactions.
+    """
+    stats = {category_id: _empty() for category_id in category_ids}
+
+    if start_date is None and end_date is None:
+        query = db.session.query(
+            TransactionRollup.category_id,
+            TransactionRollup.type,
+            func.sum(TransactionRollup.count),
+            func.sum(TransactionRollup.total)
+        ).filter(TransactionRollup.user_id == user_id)
+        if transaction_type is not None:
+            query = query.filter(TransactionRollup.type == transaction_type)
+        query = query.group_by(TransactionRollup.category_id, TransactionRollup.type)
+    else:
+        query = db.session.query(
+            Transaction.category_id,
+            Transaction.type,
+            func.count(Transaction.id),
+            func.sum(Transaction.amount)
+        ).filter(Transaction.user_id == user_id)
+        if transaction_type is not None:
+            query = query.filter(Transaction.type == transaction_type)
+        if start_date is not None:
+            query = query.filter(Transaction.transaction_date >= start_date)
+        if end_date is not None:
+            query = query.filter(Transaction.transaction_date <= end_date)
+        query = query.group_by(Transaction.category_id, Transaction.type)
+
+    for category_id, row_type, count, total in query:
+        entry = stats.setdefault(category_id, _empty())
+        entry['count'] += count or 0
+        field = 'income' if row_type == TransactionType.INCOME else 'expenses'
+        entry[field] += Decimal(str(total or 0)).quantize(Decimal('0.01'))
+    return stats
@@ -0,0 +1,114 @@
+"""Batch habit check-ins.
+
+Validates many ``(habit_id, date)`` pairs up front, loads the user's habits
+with one query and inserts every new log with a single
+``INSERT ... ON CONFLICT (habit_id, date_completed) DO NOTHING ... RETURNING``
+statement, so check-ins that already exist are reported rather than failing
+the batch (databases without ``ON CONFLICT``, such as MySQL, look the
+existing days up first and insert the rest). Each affected habit's streak is then recomputed once, from one
+query for all their logs, and the caller commits once.
+"""
+from datetime import date, datetime
+import uuid
+from sqlalchemy import select
+from app import db, cache, sync
+from app.database import supports_upsert, upsert_insert
+from app.models import Habit, HabitLog
+from app.streaks import refresh_streaks
+
+MAX_ITEMS = 500
+
+class BatchTooLarge(ValueError):
+    pass
+
+def _parse_date(value, today):
+    if value in (None, ''):
+        return today
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def _insert_missing(rows):
+    """Insert the ``rows`` whose day is not logged yet; returns ``(id, habit_id, date)``."""
+    days = [row['date_completed'] for row in rows]
+    existing = set(db.session.execute(
+        select(HabitLog.habit_id, HabitLog.date_completed)
+        .where(HabitLog.habit_id.in_({row['habit_id'] for row in rows}),
+               HabitLog.date_completed.between(min(days), max(days)))
+    ).all())
+    missing = [row for row in rows if (row['habit_id'], row['date_completed']) not in existing]
+    if missing:
+        db.session.execute(HabitLog.__table__.insert(), missing)
+    return [(row['id'], row['habit_id'], row['date_completed']) for row in missing]
+
+def check_in_many(user_id, items, today=None):
+    """Check in ``items`` (dicts with ``habit_id``, optional ``date`` and ``notes``).
+
+    Returns ``(results, habits)``: one result per item, in order, with a
+    ``status`` of ``created``, ``exists``, ``duplicate`` (repeated within the
+    batch), ``not_found`` or ``invalid``; and the checked-in ``Habit`` objects
+    by id with refreshed streaks. Nothing is committed.
+    """
+    if len(items) > MAX_ITEMS:
+        raise BatchTooLarge(f'At most {MAX_ITEMS} check-ins per request')
+    if today is None:
+        today = date.today()
+
+    results = []
+    pending = {}
+    for item in items:
+        result = {'habit_id': item.get('habit_id') if isinstance(item, dict) else None}
+        results.append(result)
+        if not isinstance(item, dict) or not item.get('habit_id'):
+            result.update(status='invalid', error='habit_id is required')
+            continue
+        try:
+            day = _parse_date(item.get('date'), today)
+        except (TypeError, ValueError):
+            result.update(status='invalid', error='Invalid date format')
+            continue
+        result['date'] = day.isoformat()
+        key = (str(item['habit_id']), day)
+        if key in pending:
+            result['status'] = 'duplicate'
+            continue
+        pending[key] = (result, item.get('notes'))
+
+    habit_ids = {habit_id for habit_id, _ in pending}
+    habits = {habit.id: habit for habit in Habit.query.filter(Habit.user_id == user_id,
+                                                             Habit.id.in_(list(habit_ids)))} if habit_ids else {}
+
+    now = datetime.utcnow()
+    rows = []
+    for (habit_id, day), (result, notes) in pending.items():
+        if habit_id not in habits:
+            result['status'] = 'not_found'
+            continue
+        rows.append({'id': str(uuid.uuid4()), 'habit_id': habit_id, 'date_completed': day,
+                     'notes': notes, 'created_at': now})
+
+    created = set()
+    if rows and not supports_upsert():
+        inserted = _insert_missing(rows)
+        created = {(habit_id, day) for _, habit_id, day in inserted}
+    elif rows:
+        statement = upsert_insert(HabitLog.__table__).values(rows)\
+            .on_conflict_do_nothing(index_elements=['habit_id', 'date_completed'])\
+            .returning(HabitLog.id, HabitLog.habit_id, HabitLog.date_completed)
+        inserted = db.session.execute(statement).all()
+        created = {(habit_id, day) for _, habit_id, day in inserted}
+
+    touched = {}
+    for row in rows:
+        key = (row['habit_id'], row['date_completed'])
+        pending[key][0]['status'] = 'created' if key in created else 'exists'
+        touched[row['habit_id']] = habits[row['habit_id']]
+
+    if created:
+        refresh_streaks({habits[habit_id] for habit_id, _ in created}, today)
+        # The Core insert bypasses the flush hooks that invalidate cached views
+        # and the stored completion rate (see app/habit_refresh.py)
+        for habit_id, _ in created:
+            habits[habit_id].stats_date = None
+        cache.mark_changed(db.session, user_id, 'habit_logs')
+        sync.record(db.session.connection(), user_id, 'habit_logs', [log_id for log_id, _, _ in inserted],
+                    sync.INSERTED)
+    return results, touched
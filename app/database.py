@@ -0,0 +1,202 @@
+"""SQLite engine profiles, connection pragmas and write serialization.
+
+``DATABASE_PROFILE`` picks the settings applied to every SQLite engine:
+
+``default``      SQLite's own defaults (rollback journal, no busy handling
+                 beyond the driver's timeout); used for development
+``production``   WAL journal so readers never block the writer,
+                 ``synchronous=NORMAL``, a 64 MB page cache, 256 MB of
+                 memory-mapped I/O, a busy timeout and a sized connection pool
+
+Individual pragmas can be overridden with ``SQLITE_PRAGMAS`` and pool
+settings with ``SQLALCHEMY_ENGINE_OPTIONS`` (or per bind in
+``SQLALCHEMY_BINDS``); explicit values always win over the profile.
+
+SQLite allows one writer at a time. With ``SQLITE_SERIALIZE_WRITES`` the
+threads of this process take a per-database lock before their first write
+statement and hold it until commit or rollback, so they queue in order
+instead of polling the file lock. Writes that still lose to another process
+raise ``OperationalError('database is locked')``; views decorated with
+``retry_on_busy`` roll back and run again with exponential backoff, and any
+that remain are answered with 503.
+"""
+from functools import wraps
+import logging
+import random
+import threading
+import time
+from flask import current_app, jsonify
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+from app import db, batch
+
+logger = logging.getLogger('app.database')
+
+PROFILES = {
+    'default': {
+        'pragmas': {},
+        'engine_options': {},
+        'serialize_writes': False,
+    },
+    'production': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -64 * 1024,  # KiB
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000,  # ms
+        },
+        'engine_options': {
+            'pool_size': 8,
+            'max_overflow': 8,
+            'pool_timeout': 10,
+            'pool_recycle': 3600,
+        },
+        'serialize_writes': True,
+    },
+}
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# One lock per database file, shared by every engine of this process
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+# Dialects whose INSERT supports ON CONFLICT ... DO NOTHING / DO UPDATE
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def _dialect_name(bind):
+    return (bind if bind is not None else db.session.get_bind()).dialect.name
+
+def supports_upsert(bind=None):
+    """Whether ``upsert_insert`` works on ``bind``; callers fall back to UPDATE + INSERT."""
+    return _dialect_name(bind) in _UPSERT_INSERTS
+
+def upsert_insert(table, bind=None):
+    """``insert(table)`` with ``on_conflict_do_nothing``/``on_conflict_do_update``
+    for the dialect of ``bind`` (default: the session's engine)."""
+    dialect = _dialect_name(bind)
+    if dialect not in _UPSERT_INSERTS:
+        raise NotImplementedError(f'INSERT ... ON CONFLICT is not supported on {dialect}')
+    return _UPSERT_INSERTS[dialect](table)
+
+def _is_sqlite(url):
+    return str(url).startswith('sqlite')
+
+def is_busy_error(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def _profile(app):
+    name = app.config['DATABASE_PROFILE']
+    if name not in PROFILES:
+        raise ValueError(f'Unknown DATABASE_PROFILE {name!r}; expected one of {sorted(PROFILES)}')
+    return PROFILES[name]
+
+def configure(app):
+    """Fill in engine options for the profile. Call before ``db.init_app``."""
+    app.config.setdefault('DATABASE_PROFILE', 'default')
+    app.config.setdefault('SQLITE_PRAGMAS', {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    app.config.setdefault('SQLITE_WRITE_LOCK_TIMEOUT', 30)
+    app.config.setdefault('SQLITE_BUSY_RETRIES', 5)
+    app.config.setdefault('SQLITE_BUSY_BACKOFF', 0.05)
+    profile = _profile(app)
+    app.config.setdefault('SQLITE_SERIALIZE_WRITES', profile['serialize_writes'])
+
+    # In-memory databases use a single static connection; pool sizes do not apply
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if _is_sqlite(uri) and ':memory:' not in uri and uri != 'sqlite://':
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(profile['engine_options'],
+                                                        **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+
+    binds = app.config.get('SQLALCHEMY_BINDS') or {}
+    for key, bind in binds.items():
+        if isinstance(bind, str):
+            bind = {'url': bind}
+        if _is_sqlite(bind['url']):
+            binds[key] = dict(profile['engine_options'], **bind)
+
+def _set_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return on_connect
+
+def _write_lock(engine):
+    key = engine.url.database or ':memory:'
+    with _write_locks_guard:
+        return _write_locks.setdefault(key, threading.RLock())
+
+def _serialize_writes(engine, timeout):
+    lock = _write_lock(engine)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get('_holds_write_lock'):
+            return
+        if not statement.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            return
+        if lock.acquire(timeout=timeout):
+            conn.info['_holds_write_lock'] = True
+        else:
+            # Fall back to SQLite's own busy handling rather than failing here
+            logger.warning('Waited %ss for the SQLite write lock; writing without it', timeout)
+
+    def release(conn):
+        if conn.info.pop('_holds_write_lock', False):
+            lock.release()
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'commit', release)
+    event.listen(engine, 'rollback', release)
+
+def retry_on_busy(view):
+    """Re-run ``view`` after a rollback when SQLite reports the database as locked."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Inside /api/batch the whole batch is retried, not one operation
+        if batch.active():
+            return view(*args, **kwargs)
+        retries = current_app.config['SQLITE_BUSY_RETRIES']
+        backoff = current_app.config['SQLITE_BUSY_BACKOFF']
+        for attempt in range(retries + 1):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as error:
+                if not is_busy_error(error) or attempt == retries:
+                    raise
+                db.session.rollback()
+                delay = backoff * 2 ** attempt
+                time.sleep(delay + random.uniform(0, delay))
+    return wrapper
+
+def _busy_response(error):
+    if not is_busy_error(error):
+        raise error
+    db.session.rollback()
+    response = jsonify({'error': 'The database is busy, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def init_app(app):
+    """Apply pragmas and write serialization to every SQLite engine."""
+    profile = _profile(app)
+    pragmas = dict(profile['pragmas'], **app.config['SQLITE_PRAGMAS'])
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != 'sqlite':
+                continue
+            if pragmas:
+                event.listen(engine, 'connect', _set_pragmas(pragmas))
+            if app.config['SQLITE_SERIALIZE_WRITES']:
+                _serialize_writes(engine, app.config['SQLITE_WRITE_LOCK_TIMEOUT'])
+
+    app.register_error_handler(OperationalError, _busy_response)
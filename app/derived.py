@@ -0,0 +1,36 @@
+"""Helpers shared by the flush listeners that maintain derived data.
+
+``app/ledger.py``, ``app/rollups.py`` and ``app/goal_progress.py`` turn each
+flush into deltas against the values a row had when it was loaded. They need
+those old values even after a commit has expired the attributes, and they sum
+money as two-decimal ``Decimal`` values.
+"""
+from decimal import Decimal
+from sqlalchemy import event, inspect
+
+CENT = Decimal('0.01')
+
+def to_decimal(value):
+    """``value`` as a ``Decimal`` rounded to cents; ``None`` counts as zero."""
+    return Decimal(str(value or 0)).quantize(CENT)
+
+def committed(obj, key):
+    """Value of ``key`` as last loaded from the database."""
+    history = inspect(obj).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, key)
+
+def _keep_previous(target, value, oldvalue, initiator):
+    pass
+
+def track_previous(model, keys):
+    """Have ``committed()`` work for ``keys`` of ``model`` after a commit.
+
+    Attributes expired by a commit have no old value to report, so have the
+    ORM load it before an assignment replaces it.
+    """
+    for key in keys:
+        event.listen(getattr(model, key), 'set', _keep_previous, active_history=True)
@@ -0,0 +1,62 @@
+"""Conditional GET (``ETag`` / ``If-None-Match``) for per-user JSON endpoints.
+
+The validator is derived from the sequence number of the user's latest
+change to each collection an endpoint reads, taken from the sync journal
+(``app/sync.py``), plus the request path and query string and today's date
+(several payloads contain day-relative figures). Because it comes from the
+database, every worker process computes the same ETag, and it survives
+restarts. Computing it is one indexed lookup per collection, so an unchanged
+collection is answered with a bodyless ``304 Not Modified`` before the view
+runs.
+
+    @api_bp.route('/goals', methods=['GET'])
+    @login_required
+    @conditional('goals', 'milestones')
+    def get_goals():
+        ...
+"""
+from datetime import date
+from functools import wraps
+import hashlib
+from flask import make_response, request
+from flask_login import current_user
+from sqlalchemy import func, select
+from app import readpath
+from app.models import SyncChange
+
+def latest_changes(user_id, collections):
+    """Sequence number of the user's latest change to each collection (``None`` if none)."""
+    table = SyncChange.__table__
+    return list(readpath.execute(select(*[
+        select(func.max(table.c.seq))
+        .where(table.c.user_id == user_id, table.c.entity == collection)
+        .scalar_subquery()
+        for collection in collections
+    ])).one())
+
+def compute_etag(user_id, collections):
+    seqs = [str(seq) for seq in latest_changes(user_id, collections)]
+    source = '|'.join([user_id, request.full_path, date.today().isoformat()] + seqs)
+    return hashlib.sha1(source.encode()).hexdigest()[:24]
+
+def conditional(*collections):
+    """Answer GETs with 304 while ``collections`` are unchanged; tag 200 responses."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            etag = compute_etag(current_user.id, collections)
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            # Per-user data: browsers may keep it but must revalidate, proxies may not
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, TextAreaField, DateField, SelectField, DecimalField, IntegerField, BooleanField, TimeField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, NumberRange, Optional
 from datetime import date, datetime
@@ -43,6 +44,11 @@ class TransactionForm(FlaskForm):
         if categories:
             self.category_id.choices = [(c.id, c.name) for c in categories]
 
+class TransactionImportForm(FlaskForm):
+    file = FileField('CSV File', validators=[FileRequired(), FileAllowed(['csv'], 'CSV files only')])
+    create_categories = BooleanField('Create missing categories')
+    partial = BooleanField('Import valid rows even if some rows have errors')
+
 class HabitForm(FlaskForm):
     name = StringField('Habit Name', validators=[DataRequired(), Length(max=200)])
     description = TextAreaField('Description', validators=[Optional(), Length(max=1000)])
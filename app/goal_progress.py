@@ -0,0 +1,121 @@
+"""Maintained milestone counters on ``goals``.
+
+Every flush that creates, deletes or (un)completes a ``Milestone`` adds the
+change to its goal's ``milestone_total`` / ``milestone_completed`` with one
+``UPDATE`` on the same connection, and recomputes ``progress_percentage`` from
+the new counts in the same statement. Goal lists, pages and ``/api/goals``
+read the three columns and never load milestones to show progress.
+``rebuild()`` repairs counters that drifted; it journals the goals it changes
+(see ``app/sync.py``), since its Core update bypasses the flush hooks.
+"""
+from datetime import datetime
+from sqlalchemy import and_, case, event, func, inspect, literal, or_, select
+from app import db, cache, sync
+from app.derived import committed, track_previous
+from app.models import Goal, GoalStatus, Milestone
+
+COUNTER_FIELDS = ('milestone_total', 'milestone_completed', 'progress_percentage', 'status', 'updated_at')
+
+track_previous(Milestone, ('goal_id', 'is_completed'))
+
+def _add(deltas, goal_id, total, completed):
+    old_total, old_completed = deltas.get(goal_id, (0, 0))
+    deltas[goal_id] = (old_total + total, old_completed + completed)
+
+def _collect_deltas(session):
+    deltas = {}
+
+    for obj in session.new:
+        if isinstance(obj, Milestone):
+            _add(deltas, obj.goal_id, 1, 1 if obj.is_completed else 0)
+
+    for obj in session.deleted:
+        if isinstance(obj, Milestone):
+            _add(deltas, committed(obj, 'goal_id'), -1, -1 if committed(obj, 'is_completed') else 0)
+
+    for obj in session.dirty:
+        if isinstance(obj, Milestone) and session.is_modified(obj, include_collections=False):
+            _add(deltas, committed(obj, 'goal_id'), -1, -1 if committed(obj, 'is_completed') else 0)
+            _add(deltas, obj.goal_id, 1, 1 if obj.is_completed else 0)
+
+    deleted_goals = {obj.id for obj in session.deleted if isinstance(obj, Goal)}
+    return {goal_id: delta for goal_id, delta in deltas.items()
+            if goal_id not in deleted_goals and delta != (0, 0)}
+
+def _progress(total, completed):
+    """SQL for ``int(completed / total * 100)``, 0 without milestones."""
+    return case((total > 0, completed * 100 // total), else_=0)
+
+def _update_statement(table, total, completed, now=None):
+    progress = _progress(total, completed)
+    values = dict(
+        milestone_total=total,
+        milestone_completed=completed,
+        progress_percentage=progress,
+        # Finishing every milestone completes the goal; nothing reopens it
+        status=case((progress == 100, literal(GoalStatus.COMPLETED, table.c.status.type)),
+                    else_=table.c.status)
+    )
+    if now is not None:
+        values['updated_at'] = now
+    return table.update().values(**values)
+
+def apply_deltas(connection, deltas):
+    """Add ``{goal_id: (total, completed)}`` to the stored counters."""
+    table = Goal.__table__
+    now = datetime.utcnow()
+    for goal_id, (total, completed) in deltas.items():
+        connection.execute(
+            _update_statement(table, table.c.milestone_total + total,
+                              table.c.milestone_completed + completed, now)
+            .where(table.c.id == goal_id)
+        )
+
+@event.listens_for(db.session, 'after_flush')
+def _maintain_counters(session, flush_context):
+    deltas = _collect_deltas(session)
+    if not deltas:
+        return
+    apply_deltas(session.connection(), deltas)
+    # Goals already loaded in this session must not keep serving the old values
+    for goal_id in deltas:
+        goal = session.identity_map.get(inspect(Goal).identity_key_from_primary_key((goal_id,)))
+        if goal is not None:
+            session.expire(goal, COUNTER_FIELDS)
+
+def rebuild(user_id=None):
+    """Recompute the counters of every goal (or one user's) from the milestones table.
+
+    Only goals whose stored counters, progress or status are wrong are updated
+    and journalled. Returns their number and commits.
+    """
+    table = Goal.__table__
+    milestones = Milestone.__table__
+    total = select(func.count()).where(milestones.c.goal_id == table.c.id).scalar_subquery()
+    completed = select(func.count()).where(milestones.c.goal_id == table.c.id,
+                                           milestones.c.is_completed.is_(True)).scalar_subquery()
+    progress = _progress(total, completed)
+
+    query = select(table.c.id, table.c.user_id).where(or_(
+        table.c.milestone_total.is_distinct_from(total),
+        table.c.milestone_completed.is_distinct_from(completed),
+        table.c.progress_percentage.is_distinct_from(progress),
+        and_(progress == 100, table.c.status != GoalStatus.COMPLETED)
+    ))
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+    connection = db.session.connection()
+    stale = {}
+    for goal_id, owner_id in connection.execute(query):
+        stale.setdefault(owner_id, []).append(goal_id)
+
+    statement = _update_statement(table, total, completed)
+    for owner_id, goal_ids in stale.items():
+        # Keep each IN list well under SQLite's bound-parameter limit
+        for start in range(0, len(goal_ids), 5000):
+            connection.execute(statement.where(table.c.id.in_(goal_ids[start:start + 5000])))
+        # The Core update bypasses the flush hooks that journal and invalidate
+        cache.mark_changed(db.session, owner_id, 'goals')
+        sync.record(connection, owner_id, 'goals', goal_ids)
+    db.session.commit()
+    return sum(len(goal_ids) for goal_ids in stale.values())
@@ -0,0 +1,202 @@
+"""Nightly refresh of every habit's streaks and 30-day completion rate.
+
+``current_streak`` only moves when a habit is checked in, so a habit nobody
+does any more keeps its old streak. ``refresh(user_ids)`` recomputes
+``current_streak``, ``longest_streak`` and ``completion_rate`` for the habits
+of those users, a chunk of users at a time: one query for the chunk's habits,
+one for their log dates, then a single executemany ``UPDATE`` and a commit.
+
+Each refreshed habit gets ``stats_date = today``, and habits already refreshed
+today are skipped, so an interrupted run picks up where it stopped when it is
+started again. ``refresh_all(workers=N)`` splits the users into N contiguous
+ranges and runs each in its own process (started with ``spawn``, so no
+database connection is shared with the parent).
+
+Habit pages and the API serve the stored rate while ``stats_date`` is today
+(see ``habit_stats.stored_rate``). Any flush that adds, edits or removes a
+habit log clears the habit's ``stats_date``, so its rate is computed live
+again until the next refresh.
+
+The refresh usually runs in its own process, so it cannot reach the web
+workers' response caches and does not try: the cached views compute streaks
+from the logs and key them by date, so a refresh does not change them. Habits
+whose stored streaks move are recorded in the sync journal, which is what
+ETags and ``/api/sync`` read.
+
+    flask --app run habits refresh-stats [--workers 4] [--chunk-size 500] [--force]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+import multiprocessing
+import os
+import time
+from sqlalchemy import bindparam, event, inspect, or_, select
+from app import db, sync
+from app.database import retry_on_busy
+from app.derived import committed
+from app.habit_stats import RATE_WINDOW
+from app.models import Habit, HabitLog, User
+from app.streaks import compute_streaks
+
+CHUNK_SIZE = 500
+
+class RefreshStats:
+    def __init__(self, users=0):
+        self.users = users
+        self.habits = 0
+        self.logs = 0
+        self.changed = 0
+        self.seconds = 0.0
+
+    def add(self, other):
+        self.users += other.users
+        self.habits += other.habits
+        self.logs += other.logs
+        self.changed += other.changed
+
+    def summary(self):
+        rate = self.habits / self.seconds if self.seconds else 0
+        log_rate = self.logs / self.seconds if self.seconds else 0
+        return (f'{self.habits} habit(s) of {self.users} user(s) from {self.logs} log(s) '
+                f'in {self.seconds:.1f}s ({rate:,.0f} habits/s, {log_rate:,.0f} logs/s); '
+                f'{self.changed} streak(s) changed')
+
+_update = Habit.__table__.update()\
+    .where(Habit.__table__.c.id == bindparam('habit_id'))\
+    .values(current_streak=bindparam('current'),
+            longest_streak=bindparam('longest'),
+            completion_rate=bindparam('rate'),
+            stats_date=bindparam('today'))
+
+@retry_on_busy
+def _refresh_chunk(user_ids, today, force=False):
+    habits_table = Habit.__table__
+    logs_table = HabitLog.__table__
+    connection = db.session.connection()
+    stats = RefreshStats(users=len(user_ids))
+
+    query = select(habits_table.c.id, habits_table.c.user_id, habits_table.c.frequency,
+                   habits_table.c.current_streak, habits_table.c.longest_streak)\
+        .where(habits_table.c.user_id.in_(user_ids))
+    if not force:
+        query = query.where(or_(habits_table.c.stats_date.is_(None), habits_table.c.stats_date != today))
+    habits = connection.execute(query).all()
+    if not habits:
+        return stats
+
+    dates = {habit.id: [] for habit in habits}
+    habit_ids = list(dates)
+    # Keep each IN list well under SQLite's bound-parameter limit
+    for start in range(0, len(habit_ids), 5000):
+        rows = connection.execute(
+            select(logs_table.c.habit_id, logs_table.c.date_completed)
+            .where(logs_table.c.habit_id.in_(habit_ids[start:start + 5000]),
+                   logs_table.c.date_completed <= today)
+        )
+        for habit_id, day in rows:
+            dates[habit_id].append(day)
+            stats.logs += 1
+
+    window_start = today - timedelta(days=RATE_WINDOW - 1)
+    params = []
+    changed = {}
+    for habit in habits:
+        habit_dates = dates[habit.id]
+        current, longest = compute_streaks(habit_dates, habit.frequency, today)
+        recent = sum(1 for day in habit_dates if day >= window_start)
+        params.append({'habit_id': habit.id, 'current': current, 'longest': longest,
+                       'rate': recent / RATE_WINDOW * 100, 'today': today})
+        if (current, longest) != (habit.current_streak, habit.longest_streak):
+            changed.setdefault(habit.user_id, []).append(habit.id)
+
+    connection.execute(_update, params)
+    # The Core update bypasses the flush hook that journals changes
+    for user_id, habit_ids in changed.items():
+        sync.record(connection, user_id, 'habits', habit_ids)
+    db.session.commit()
+
+    stats.habits = len(habits)
+    stats.changed = sum(len(habit_ids) for habit_ids in changed.values())
+    return stats
+
+def refresh(user_ids, today=None, chunk_size=CHUNK_SIZE, force=False, progress=None):
+    """Refresh the habits of ``user_ids`` in chunks of ``chunk_size`` users."""
+    if today is None:
+        today = date.today()
+    started = time.perf_counter()
+    total = RefreshStats()
+    for start in range(0, len(user_ids), chunk_size):
+        total.add(_refresh_chunk(user_ids[start:start + chunk_size], today, force))
+        total.seconds = time.perf_counter() - started
+        if progress:
+            progress(total, len(user_ids))
+    total.users = len(user_ids)
+    total.seconds = time.perf_counter() - started
+    return total
+
+def _worker(database_url, user_ids, today, chunk_size, force):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        return refresh(user_ids, today, chunk_size, force)
+
+def _partitions(user_ids, count):
+    size = -(-len(user_ids) // count)
+    return [user_ids[start:start + size] for start in range(0, len(user_ids), size)]
+
+def refresh_all(today=None, chunk_size=CHUNK_SIZE, workers=1, force=False, progress=None):
+    """Refresh every habit in the database; ``workers`` > 1 fans out over processes."""
+    if today is None:
+        today = date.today()
+    user_ids = [user_id for (user_id,) in db.session.execute(select(User.id).order_by(User.id))]
+    db.session.commit()
+    if workers <= 1 or len(user_ids) < 2:
+        return refresh(user_ids, today, chunk_size, force, progress)
+
+    started = time.perf_counter()
+    total = RefreshStats()
+    database_url = db.engine.url.render_as_string(hide_password=False)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(_worker, database_url, partition, today, chunk_size, force)
+                   for partition in _partitions(user_ids, workers)]
+        for future in as_completed(futures):
+            total.add(future.result())
+            total.seconds = time.perf_counter() - started
+            if progress:
+                progress(total, len(user_ids))
+    total.users = len(user_ids)
+    total.seconds = time.perf_counter() - started
+    return total
+
+def _changed_habits(session):
+    habit_ids = set()
+    for obj in session.new:
+        if isinstance(obj, HabitLog):
+            habit_ids.add(obj.habit_id)
+    for obj in session.deleted:
+        if isinstance(obj, HabitLog):
+            habit_ids.add(committed(obj, 'habit_id'))
+    for obj in session.dirty:
+        if isinstance(obj, HabitLog) and session.is_modified(obj, include_collections=False):
+            habit_ids.update((committed(obj, 'habit_id'), obj.habit_id))
+    habit_ids -= {obj.id for obj in session.deleted if isinstance(obj, Habit)}
+    return habit_ids
+
+@event.listens_for(db.session, 'after_flush')
+def _forget_stored_rates(session, flush_context):
+    habit_ids = _changed_habits(session)
+    if not habit_ids:
+        return
+    table = Habit.__table__
+    session.connection().execute(
+        table.update()
+        .where(table.c.id.in_(habit_ids), table.c.stats_date.is_not(None))
+        .values(stats_date=None)
+    )
+    # Habits already loaded in this session must not keep serving the old date
+    for habit_id in habit_ids:
+        habit = session.identity_map.get(inspect(Habit).identity_key_from_primary_key((habit_id,)))
+        if habit is not None:
+            session.expire(habit, ['stats_date'])
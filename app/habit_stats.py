@@ -0,0 +1,138 @@
+"""Per-habit statistics computed for many habits with grouped queries."""
+from datetime import date, timedelta
+from sqlalchemy import case, func
+from app import db
+from app.models import HabitLog, HabitFrequency
+
+def completion_rates(habit_ids, days=30, today=None):
+    """``{habit_id: percentage}`` matching ``Habit.get_completion_rate``."""
+    if today is None:
+        today = date.today()
+    rates = {habit_id: 0 for habit_id in habit_ids}
+    if not habit_ids or days <= 0:
+        return rates
+
+    # The last ``days`` days including today
+    start_date = today - timedelta(days=days - 1)
+    rows = db.session.query(HabitLog.habit_id, func.count(HabitLog.id)).filter(
+        HabitLog.habit_id.in_(habit_ids),
+        HabitLog.date_completed.between(start_date, today)
+    ).group_by(HabitLog.habit_id)
+
+    for habit_id, completed_days in rows:
+        rates[habit_id] = (completed_days / days) * 100
+    return rates
+
+DEFAULT_WINDOWS = (7, 30, 90)
+
+# Window of the ``Habit.completion_rate`` stored by ``app/habit_refresh.py``
+RATE_WINDOW = 30
+
+def stored_rate(habit, today=None):
+    """The stored ``completion_rate`` if it is current, else ``None``.
+
+    It is current on the day it was computed (``stats_date``) until one of the
+    habit's logs changes, which clears ``stats_date``.
+    """
+    if today is None:
+        today = date.today()
+    if getattr(habit, 'stats_date', None) == today:
+        return habit.completion_rate
+    return None
+
+def _period_start(frequency, today):
+    if frequency == HabitFrequency.WEEKLY:
+        return today - timedelta(days=today.weekday())
+    if frequency == HabitFrequency.MONTHLY:
+        return today.replace(day=1)
+    return today
+
+def habit_summaries(habits, windows=DEFAULT_WINDOWS, today=None):
+    """Completion statistics for many habits from one grouped query.
+
+    Returns ``{habit_id: {'completed_today', 'completion_rates', 'current_streak'}}``
+    where ``completion_rates`` maps each window (in days) to the percentage
+    ``Habit.get_completion_rate`` would return for it; the 30-day rate is
+    taken from ``stored_rate`` where it is current. The stored
+    ``current_streak`` is only correct as of the habit's last check-in, so it
+    is reported as 0 when the current day/week/month has no check-in yet.
+    """
+    if today is None:
+        today = date.today()
+    windows = sorted({window for window in windows if window > 0})
+    summaries = {habit.id: {
+        'completed_today': False,
+        'completion_rates': {window: 0 for window in windows},
+        'current_streak': 0
+    } for habit in habits}
+    if not habits:
+        return summaries
+
+    stored = {}
+    if RATE_WINDOW in windows:
+        for habit in habits:
+            rate = stored_rate(habit, today)
+            if rate is not None:
+                stored[habit.id] = rate
+    # Count the stored window only for habits without a current stored rate
+    counted = [window for window in windows if window != RATE_WINDOW or len(stored) < len(habits)]
+
+    def done_since(start):
+        return func.sum(case((HabitLog.date_completed >= start, 1), else_=0))
+
+    week_start = _period_start(HabitFrequency.WEEKLY, today)
+    month_start = _period_start(HabitFrequency.MONTHLY, today)
+    earliest = min([today - timedelta(days=max(counted, default=1) - 1), week_start, month_start])
+
+    rows = db.session.query(
+        HabitLog.habit_id,
+        done_since(today),
+        done_since(week_start),
+        done_since(month_start),
+        *[done_since(today - timedelta(days=window - 1)) for window in counted]
+    ).filter(
+        HabitLog.habit_id.in_(list(summaries)),
+        HabitLog.date_completed.between(earliest, today)
+    ).group_by(HabitLog.habit_id)
+
+    counts = {row[0]: row[1:] for row in rows}
+    for habit in habits:
+        done_today, done_this_week, done_this_month, *window_counts = counts.get(habit.id, (0,) * (3 + len(counted)))
+        summary = summaries[habit.id]
+        summary['completed_today'] = bool(done_today)
+        summary['completion_rates'] = {window: (count / window) * 100
+                                       for window, count in zip(counted, window_counts)}
+        if habit.id in stored:
+            summary['completion_rates'][RATE_WINDOW] = stored[habit.id]
+        done_in_period = {
+            HabitFrequency.WEEKLY: done_this_week,
+            HabitFrequency.MONTHLY: done_this_month
+        }.get(habit.frequency, done_today)
+        summary['current_streak'] = (habit.current_streak or 0) if done_in_period else 0
+    return summaries
+
+def completion_runs(habit_ids, start, end):
+    """``{habit_id: [[offset, length], ...]}`` runs of consecutive check-in days.
+
+    Offsets count days from ``start``; only check-ins between ``start`` and
+    ``end`` (inclusive) are included. The ``(habit_id, date_completed)``
+    unique index already holds the rows in this order, so the ``ORDER BY``
+    is cheap.
+    """
+    runs = {habit_id: [] for habit_id in habit_ids}
+    if not habit_ids:
+        return runs
+
+    rows = db.session.query(HabitLog.habit_id, HabitLog.date_completed).filter(
+        HabitLog.habit_id.in_(habit_ids),
+        HabitLog.date_completed.between(start, end)
+    ).order_by(HabitLog.habit_id, HabitLog.date_completed)
+
+    for habit_id, day in rows:
+        offset = (day - start).days
+        habit_runs = runs[habit_id]
+        if habit_runs and habit_runs[-1][0] + habit_runs[-1][1] == offset:
+            habit_runs[-1][1] += 1
+        else:
+            habit_runs.append([offset, 1])
+    return runs
@@ -0,0 +1,94 @@
+"""Cached identities for ``login_manager.user_loader``.
+
+Flask-Login resolves the session's user id on every authenticated request.
+Instead of loading the ``User`` row each time, the loader keeps a small
+in-process LRU of ``SessionUser`` snapshots (id, username, email and login
+timestamps) that expire after ``USER_CACHE_TTL`` seconds. Commits that change
+or delete a user evict the entry, so password changes, ``last_login`` updates
+and deletions take effect on that user's next request; other worker processes
+notice within the TTL.
+
+Configuration (all optional):
+
+``USER_CACHE_TTL``           seconds a snapshot is trusted (0 disables the cache)
+``USER_CACHE_MAX_ENTRIES``   number of users kept
+"""
+import time
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from app import db
+from app.cache import LocalCache
+from app.models import User
+
+class SessionUser(UserMixin):
+    """Detached, read-only stand-in for ``User`` used as ``current_user``.
+
+    Routes that only need ``current_user.id`` never touch the database; use
+    ``get_user()`` for the full row.
+    """
+
+    def __init__(self, id, username, email, created_at=None, last_login=None):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.created_at = created_at
+        self.last_login = last_login
+
+    def get_balance(self):
+        from app.ledger import get_totals
+        income, expenses = get_totals(self.id)
+        return float(income - expenses)
+
+    def get_user(self):
+        return db.session.get(User, self.id)
+
+    def __repr__(self):
+        return f'<SessionUser {self.username}>'
+
+def _cache():
+    return current_app.extensions['identity_cache']
+
+def load_user(user_id):
+    """``SessionUser`` for ``user_id``, from the cache or one narrow query."""
+    ttl = current_app.config['USER_CACHE_TTL']
+    if ttl > 0:
+        entry = _cache().get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+    row = db.session.query(User.id, User.username, User.email, User.created_at, User.last_login)\
+                    .filter(User.id == user_id).first()
+    if row is None:
+        return None
+    user = SessionUser(*row)
+    if ttl > 0:
+        _cache().set(user_id, (time.monotonic() + ttl, user))
+    return user
+
+def forget(user_id):
+    if has_app_context():
+        _cache().delete(user_id)
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('_changed_users', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+@event.listens_for(db.session, 'after_commit')
+def _evict_changed_users(session):
+    for user_id in session.info.pop('_changed_users', ()):
+        forget(user_id)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_changed_users(session, previous_transaction):
+    # A rolled back savepoint (see app/batch.py) leaves the outer writes pending
+    if not previous_transaction.nested:
+        session.info.pop('_changed_users', None)
+
+def init_app(app):
+    app.config.setdefault('USER_CACHE_TTL', 60)
+    app.config.setdefault('USER_CACHE_MAX_ENTRIES', 1024)
+    app.extensions['identity_cache'] = LocalCache(app.config['USER_CACHE_MAX_ENTRIES'])
@@ -0,0 +1,173 @@
+"""Bulk transaction import.
+
+Accepts rows in the columns ``export_transactions`` writes (Date, Type, Amount,
+Category, Description) from CSV or as JSON objects, validates all of them up
+front, resolves category names with one query and inserts the accepted rows
+with chunked ``executemany`` statements inside a single transaction. A locked
+SQLite database re-runs the whole import after a rollback (``retry_on_busy``).
+"""
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import uuid
+from app import db, cache, ledger, rollups, sync
+from app.database import retry_on_busy
+from app.models import Category, Transaction, TransactionType
+
+CHUNK_SIZE = 1000
+MAX_AMOUNT = Decimal('99999999.99')  # Transaction.amount is Numeric(10, 2)
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+        self.created_categories = []
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'errors': self.errors,
+            'created_categories': self.created_categories
+        }
+
+def read_csv(stream):
+    """Rows from a CSV text stream whose first line is the header."""
+    # Read up front: an import retried after a busy error needs the rows again
+    return list(csv.DictReader(stream))
+
+def _normalize(row):
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    return {(key or '').strip().lower(): value for key, value in row.items()}
+
+def _parse(row):
+    """Return ``(values, category_name)`` or raise ``ValueError`` with a message."""
+    row = _normalize(row)
+
+    raw_date = str(row.get('date') or '').strip()
+    try:
+        transaction_date = datetime.strptime(raw_date, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Invalid date "{raw_date}" (expected YYYY-MM-DD)')
+
+    raw_type = str(row.get('type') or '').strip().capitalize()
+    try:
+        transaction_type = TransactionType(raw_type)
+    except ValueError:
+        raise ValueError(f'Invalid type "{raw_type}" (expected Income or Expense)')
+
+    try:
+        amount = Decimal(str(row.get('amount')).strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'Invalid amount "{row.get("amount")}"')
+    if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT:
+        raise ValueError(f'Amount must be between 0.01 and {MAX_AMOUNT}')
+
+    category_name = str(row.get('category') or '').strip()
+    if not category_name:
+        raise ValueError('Category is required')
+    if len(category_name) > 100:
+        raise ValueError('Category name is longer than 100 characters')
+
+    description = str(row.get('description') or '').strip()
+    if len(description) > 500:
+        raise ValueError('Description is longer than 500 characters')
+
+    return {
+        'transaction_date': transaction_date,
+        'type': transaction_type,
+        'amount': amount,
+        'description': description
+    }, category_name
+
+@retry_on_busy
+def import_transactions(user_id, rows, partial=False, create_categories=False):
+    """Validate and insert ``rows`` for a user.
+
+    Expenses are checked against a running balance that starts at the stored
+    balance and follows the rows in order, the same rule the single-entry
+    forms apply. Unless ``partial`` is set, any error rejects the whole batch.
+    Unknown category names are errors unless ``create_categories`` is set.
+    """
+    result = ImportResult()
+    categories = {}
+    for category_id, name in db.session.query(Category.id, Category.name).filter_by(user_id=user_id):
+        categories.setdefault(name.strip().lower(), category_id)
+
+    income, expenses = ledger.get_totals(user_id)
+    balance = income - expenses
+    new_categories = {}
+    accepted = []
+
+    for index, row in enumerate(rows, start=1):
+        try:
+            values, category_name = _parse(row)
+        except ValueError as exc:
+            result.errors.append({'row': index, 'error': str(exc)})
+            continue
+
+        key = category_name.lower()
+        category_id = categories.get(key) or new_categories.get(key, (None,))[0]
+        if category_id is None:
+            if not create_categories:
+                result.errors.append({'row': index, 'error': f'Unknown category "{category_name}"'})
+                continue
+            category_id = str(uuid.uuid4())
+            new_categories[key] = (category_id, category_name)
+
+        if values['type'] == TransactionType.EXPENSE:
+            if values['amount'] > balance:
+                result.errors.append({'row': index,
+                                      'error': f'Insufficient funds. Running balance: ${balance:.2f}'})
+                continue
+            balance -= values['amount']
+        else:
+            balance += values['amount']
+
+        values['category_id'] = category_id
+        accepted.append(values)
+
+    if result.errors and not partial:
+        return result
+
+    now = datetime.utcnow()
+    connection = db.session.connection()
+
+    if new_categories:
+        used = {values['category_id'] for values in accepted}
+        category_rows = [{
+            'id': category_id,
+            'user_id': user_id,
+            'name': name,
+            'color': '#6B7280',
+            'icon': '📊',
+            'is_default': False,
+            'created_at': now
+        } for category_id, name in new_categories.values() if category_id in used]
+        if category_rows:
+            connection.execute(Category.__table__.insert(), category_rows)
+            sync.record(connection, user_id, 'categories', [row['id'] for row in category_rows], sync.INSERTED)
+            result.created_categories = [row['name'] for row in category_rows]
+
+    table = Transaction.__table__
+    income_delta = expense_delta = Decimal('0')
+    for start in range(0, len(accepted), CHUNK_SIZE):
+        chunk = accepted[start:start + CHUNK_SIZE]
+        for values in chunk:
+            values.update(id=str(uuid.uuid4()), user_id=user_id, created_at=now, receipt_url=None)
+            if values['type'] == TransactionType.INCOME:
+                income_delta += values['amount']
+            else:
+                expense_delta += values['amount']
+        connection.execute(table.insert(), chunk)
+
+    # Core inserts bypass the ORM flush hooks, so maintain the derived tables here
+    if accepted:
+        ledger.apply_deltas(connection, {user_id: (income_delta, expense_delta)})
+        rollups.add_rows(connection, accepted)
+        cache.mark_changed(db.session, user_id, 'transactions', 'categories')
+        sync.record(connection, user_id, 'transactions', [values['id'] for values in accepted], sync.INSERTED)
+
+    db.session.commit()
+    result.imported = len(accepted)
+    return result
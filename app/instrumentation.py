@@ -0,0 +1,176 @@
+"""Per-request SQL statement counting and timing.
+
+Hooks the engine created by ``create_app`` and, for sampled requests, records
+how many statements ran, the total time spent in the database and the slowest
+statements. The numbers are exposed as a ``Server-Timing`` header plus
+``X-Query-Count`` and logged as one JSON line on the ``app.sql`` logger.
+
+Configuration (all optional):
+
+``SQL_INSTRUMENTATION``               turn the per-request recording on/off
+``SQL_INSTRUMENTATION_SAMPLE_RATE``   fraction of requests recorded (0.0-1.0)
+``SQL_INSTRUMENTATION_SLOWEST``       how many slow statements to keep
+``QUERY_BUDGETS``                     ``{endpoint: max_queries}``
+``QUERY_BUDGET_STRICT``               raise instead of logging when a budget
+                                      is exceeded (defaults to ``app.testing``)
+
+Tests can also wrap any block in ``query_budget(n)``.
+
+Streamed responses (``stream_with_context``) keep running statements after
+their headers are sent: the headers count only the statements before the body
+started, and the log line and budget check wait for ``teardown_request``, when
+the whole body has been produced.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import random
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger('app.sql')
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, budget, statements, label=None):
+        self.budget = budget
+        self.statements = statements
+        where = f' in {label}' if label else ''
+        listing = '\n'.join(f'  {i + 1}. {s}' for i, s in enumerate(statements))
+        super().__init__(f'{len(statements)} queries executed{where}, budget is {budget}:\n{listing}')
+
+class QueryStats:
+    def __init__(self, keep_slowest=3, keep_statements=False):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest = []
+        self.keep_slowest = keep_slowest
+        self.statements = [] if keep_statements else None
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total_time += duration
+        if self.statements is not None:
+            self.statements.append(statement)
+        if self.keep_slowest:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.keep_slowest:]
+
+    def as_dict(self):
+        return {
+            'query_count': self.count,
+            'db_ms': round(self.total_time * 1000, 2),
+            'slowest': [{'ms': round(duration * 1000, 2), 'sql': _shorten(statement)}
+                        for duration, statement in self.slowest]
+        }
+
+def _shorten(statement, limit=200):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit - 3] + '...'
+
+# Open ``query_budget`` blocks, innermost last; per thread / task
+_budget_stack = ContextVar('query_budgets', default=())
+
+def _active_recorders():
+    recorders = list(_budget_stack.get())
+    if has_request_context():
+        stats = g.get('_query_stats')
+        if stats is not None:
+            recorders.append(stats)
+    return recorders
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_query_start'].pop()
+    recorders = _active_recorders()
+    if recorders:
+        duration = time.perf_counter() - started
+        for stats in recorders:
+            stats.record(statement, duration)
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get('_query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+def _start_request():
+    config = current_app.config
+    if config['SQL_INSTRUMENTATION'] and random.random() < config['SQL_INSTRUMENTATION_SAMPLE_RATE']:
+        g._query_stats = QueryStats(keep_slowest=config['SQL_INSTRUMENTATION_SLOWEST'],
+                                    keep_statements=bool(config['QUERY_BUDGETS']))
+
+def _finish_request(response):
+    stats = g.get('_query_stats')
+    if stats is None:
+        return response
+
+    response.headers['X-Query-Count'] = str(stats.count)
+    response.headers.add('Server-Timing',
+                         f'db;dur={stats.total_time * 1000:.2f};desc="{stats.count} queries"')
+
+    if response.is_streamed:
+        # The body has not run yet; report once it has (see _teardown_request)
+        g._query_status = response.status_code
+        return response
+    g.pop('_query_stats')
+    _report(stats, response.status_code)
+    return response
+
+def _teardown_request(exception):
+    stats = g.pop('_query_stats', None)
+    if stats is not None:
+        _report(stats, g.pop('_query_status', 500))
+
+def _report(stats, status):
+    logger.info(json.dumps(dict(stats.as_dict(),
+                                endpoint=request.endpoint,
+                                method=request.method,
+                                path=request.path,
+                                status=status)))
+
+    budget = current_app.config['QUERY_BUDGETS'].get(request.endpoint)
+    if budget is not None and stats.count > budget:
+        error = QueryBudgetExceeded(budget, stats.statements, request.endpoint)
+        strict = current_app.config['QUERY_BUDGET_STRICT']
+        if strict is None:
+            strict = current_app.testing
+        if strict:
+            raise error
+        logger.warning(str(error))
+
+@contextmanager
+def query_budget(max_queries, label=None):
+    """Fail with ``QueryBudgetExceeded`` if the block runs more than ``max_queries`` statements.
+
+        with query_budget(10):
+            client.get('/dashboard')
+    """
+    stats = QueryStats(keep_slowest=0, keep_statements=True)
+    token = _budget_stack.set(_budget_stack.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _budget_stack.reset(token)
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(max_queries, stats.statements, label)
+
+def init_app(app):
+    app.config.setdefault('SQL_INSTRUMENTATION', True)
+    app.config.setdefault('SQL_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+    app.config.setdefault('SQL_INSTRUMENTATION_SLOWEST', 3)
+    app.config.setdefault('QUERY_BUDGETS', {})
+    app.config.setdefault('QUERY_BUDGET_STRICT', None)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_error)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
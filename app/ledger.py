@@ -0,0 +1,166 @@
+"""Maintained per-user balance totals.
+
+Every flush that creates, edits or deletes a ``Transaction`` applies the
+income/expense delta to ``user_balances`` on the same connection, so the
+running totals commit (or roll back) together with the rows they describe.
+"""
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import event, func, select
+from app import db
+from app.derived import committed, to_decimal, track_previous
+from app.models import User, UserBalance, Transaction, TransactionType
+
+def _type_of(value):
+    if isinstance(value, TransactionType):
+        return value
+    return TransactionType(value)
+
+TRACKED_FIELDS = ('user_id', 'type', 'amount', 'category_id', 'transaction_date')
+
+track_previous(Transaction, TRACKED_FIELDS)
+
+def _snapshot(obj, loaded=False):
+    if loaded:
+        return {key: committed(obj, key) for key in TRACKED_FIELDS}
+    return {key: getattr(obj, key) for key in TRACKED_FIELDS}
+
+def transaction_changes(session):
+    """Yield ``(sign, values)`` for every Transaction row a flush adds or removes.
+
+    Inserts yield ``+1`` with the new values, deletes ``-1`` with the values as
+    loaded, and edits both. ``values`` holds the fields in ``TRACKED_FIELDS``.
+    Call from ``after_flush``, while the pre-flush history is still available.
+    """
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            yield 1, _snapshot(obj)
+
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            yield -1, _snapshot(obj, loaded=True)
+
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj, include_collections=False):
+            yield -1, _snapshot(obj, loaded=True)
+            yield 1, _snapshot(obj)
+
+def deleted_user_ids(session):
+    return {obj.id for obj in session.deleted if isinstance(obj, User)}
+
+def _add(deltas, user_id, transaction_type, amount):
+    income, expense = deltas.get(user_id, (Decimal('0'), Decimal('0')))
+    if _type_of(transaction_type) == TransactionType.INCOME:
+        income += to_decimal(amount)
+    else:
+        expense += to_decimal(amount)
+    deltas[user_id] = (income, expense)
+
+def _collect_deltas(session):
+    deltas = {}
+
+    for obj in session.new:
+        if isinstance(obj, User):
+            deltas.setdefault(obj.id, (Decimal('0'), Decimal('0')))
+
+    for sign, values in transaction_changes(session):
+        _add(deltas, values['user_id'], values['type'], sign * to_decimal(values['amount']))
+
+    deleted_users = deleted_user_ids(session)
+    return {user_id: delta for user_id, delta in deltas.items() if user_id not in deleted_users}
+
+def _sum_totals(connection, user_id):
+    rows = connection.execute(
+        select(Transaction.type, func.sum(Transaction.amount))
+        .where(Transaction.user_id == user_id)
+        .group_by(Transaction.type)
+    ).all()
+    totals = {transaction_type: total for transaction_type, total in rows}
+    return (to_decimal(totals.get(TransactionType.INCOME)),
+            to_decimal(totals.get(TransactionType.EXPENSE)))
+
+def apply_deltas(connection, deltas):
+    """Add ``{user_id: (income, expense)}`` to the stored totals.
+
+    Users without a balance row yet (new accounts, or databases created before
+    the table existed) get one built from their transactions, which at this
+    point already include the rows being flushed.
+    """
+    table = UserBalance.__table__
+    now = datetime.utcnow()
+    for user_id, (income, expense) in deltas.items():
+        result = connection.execute(
+            table.update()
+            .where(table.c.user_id == user_id)
+            .values(income_total=table.c.income_total + income,
+                    expense_total=table.c.expense_total + expense,
+                    updated_at=now)
+        )
+        if result.rowcount == 0:
+            income_total, expense_total = _sum_totals(connection, user_id)
+            connection.execute(table.insert().values(
+                user_id=user_id,
+                income_total=income_total,
+                expense_total=expense_total,
+                updated_at=now
+            ))
+
+@event.listens_for(db.session, 'after_flush')
+def _maintain_balances(session, flush_context):
+    deltas = _collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+def get_totals(user_id):
+    """Return ``(income_total, expense_total)`` for a user with one key lookup."""
+    row = db.session.query(UserBalance.income_total, UserBalance.expense_total)\
+                    .filter(UserBalance.user_id == user_id).first()
+    if row is None:
+        # Not backfilled yet; ``reconcile`` (or the user's next write) creates it.
+        return _sum_totals(db.session.connection(), user_id)
+    return to_decimal(row.income_total), to_decimal(row.expense_total)
+
+def reconcile(fix=True):
+    """Recompute every user's totals from scratch and report drift.
+
+    Returns a list of ``(user_id, stored, actual)`` tuples where ``stored`` is
+    ``None`` for users that had no balance row. With ``fix`` the stored rows are
+    rewritten to the actual totals and committed.
+    """
+    actual = {user_id: (Decimal('0'), Decimal('0'))
+              for (user_id,) in db.session.query(User.id)}
+    rows = db.session.query(Transaction.user_id, Transaction.type, func.sum(Transaction.amount))\
+                     .group_by(Transaction.user_id, Transaction.type)
+    for user_id, transaction_type, total in rows:
+        income, expense = actual.get(user_id, (Decimal('0'), Decimal('0')))
+        if transaction_type == TransactionType.INCOME:
+            income = to_decimal(total)
+        else:
+            expense = to_decimal(total)
+        actual[user_id] = (income, expense)
+
+    stored = {
+        user_id: (to_decimal(income), to_decimal(expense))
+        for user_id, income, expense in db.session.query(
+            UserBalance.user_id, UserBalance.income_total, UserBalance.expense_total
+        )
+    }
+
+    drift = [(user_id, stored.get(user_id), totals)
+             for user_id, totals in actual.items()
+             if stored.get(user_id) != totals]
+
+    if fix and drift:
+        table = UserBalance.__table__
+        now = datetime.utcnow()
+        connection = db.session.connection()
+        connection.execute(table.delete().where(table.c.user_id.in_([d[0] for d in drift])))
+        connection.execute(table.insert(), [{
+            'user_id': user_id,
+            'income_total': income,
+            'expense_total': expense,
+            'updated_at': now
+        } for user_id, _, (income, expense) in drift])
+        db.session.commit()
+
+    return drift
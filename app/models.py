@@ -34,29 +34,37 @@ class User(UserMixin, db.Model):
     transactions = db.relationship('Transaction', backref='user', lazy=True, cascade='all, delete-orphan')
     habits = db.relationship('Habit', backref='user', lazy=True, cascade='all, delete-orphan')
     categories = db.relationship('Category', backref='user', lazy=True, cascade='all, delete-orphan')
+    balance = db.relationship('UserBalance', backref='user', lazy=True, uselist=False, cascade='all, delete-orphan')
+    rollups = db.relationship('TransactionRollup', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from app.passwords import hash_method
+        self.password_hash = generate_password_hash(password, method=hash_method())
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
     def get_balance(self):
-        income = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == self.id,
-            Transaction.type == TransactionType.INCOME
-        ).scalar() or 0
-        
-        expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == self.id,
-            Transaction.type == TransactionType.EXPENSE
-        ).scalar() or 0
-        
-        return float(income) - float(expenses)
+        # Reads the maintained running totals (see app/ledger.py) instead of
+        # summing every transaction the user has ever recorded.
+        from app.ledger import get_totals
+        income, expenses = get_totals(self.id)
+        return float(income - expenses)
     
     def __repr__(self):
         return f'<User {self.username}>'
 
+class UserBalance(db.Model):
+    __tablename__ = 'user_balances'
+    
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    income_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    expense_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserBalance {self.user_id}: +{self.income_total} -{self.expense_total}>'
+
 class Goal(db.Model):
     __tablename__ = 'goals'
     
@@ -67,21 +75,15 @@ class Goal(db.Model):
     target_date = db.Column(db.Date)
     status = db.Column(db.Enum(GoalStatus), default=GoalStatus.ACTIVE)
     progress_percentage = db.Column(db.Integer, default=0)
+    # Maintained by app/goal_progress.py together with progress_percentage
+    milestone_total = db.Column(db.Integer, nullable=False, default=0)
+    milestone_completed = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     milestones = db.relationship('Milestone', backref='goal', lazy=True, cascade='all, delete-orphan')
     
-    def update_progress(self):
-        if self.milestones:
-            completed_milestones = len([m for m in self.milestones if m.is_completed])
-            total_milestones = len(self.milestones)
-            self.progress_percentage = int((completed_milestones / total_milestones) * 100)
-            
-            if self.progress_percentage == 100:
-                self.status = GoalStatus.COMPLETED
-        else:
-            self.progress_percentage = 0
+    __table_args__ = (db.Index('ix_goals_user_status_created', 'user_id', 'status', 'created_at'),)
     
     def days_remaining(self):
         if self.target_date:
@@ -104,10 +106,11 @@ class Milestone(db.Model):
     completed_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (db.Index('ix_milestones_goal', 'goal_id'),)
+    
     def mark_complete(self):
         self.is_completed = True
         self.completed_at = datetime.utcnow()
-        self.goal.update_progress()
     
     def __repr__(self):
         return f'<Milestone {self.title}>'
@@ -125,6 +128,8 @@ class Category(db.Model):
     
     transactions = db.relationship('Transaction', backref='category', lazy=True)
     
+    __table_args__ = (db.Index('ix_categories_user', 'user_id'),)
+    
     def get_total_amount(self, transaction_type=None, start_date=None, end_date=None):
         query = Transaction.query.filter(Transaction.category_id == self.id)
         
@@ -135,9 +140,7 @@ class Category(db.Model):
         if end_date:
             query = query.filter(Transaction.transaction_date <= end_date)
         
-        return db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.category_id == self.id
-        ).scalar() or 0
+        return query.with_entities(db.func.sum(Transaction.amount)).scalar() or 0
     
     def __repr__(self):
         return f'<Category {self.name}>'
@@ -155,9 +158,59 @@ class Transaction(db.Model):
     receipt_url = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_transactions_user_type_date', 'user_id', 'type', 'transaction_date'),
+        db.Index('ix_transactions_user_date_id', 'user_id', 'transaction_date', 'id'),
+        db.Index('ix_transactions_user_created', 'user_id', 'created_at'),
+        db.Index('ix_transactions_category', 'category_id'),
+    )
+    
     def __repr__(self):
         return f'<Transaction {self.type.value}: ${self.amount}>'
 
+class TransactionRollup(db.Model):
+    __tablename__ = 'transaction_rollups'
+    
+    # One row per user, month, category and type; maintained by app/rollups.py
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    category_id = db.Column(db.String(36), db.ForeignKey('categories.id'), primary_key=True)
+    type = db.Column(db.Enum(TransactionType), primary_key=True)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<TransactionRollup {self.year}-{self.month:02d} {self.type.value}: ${self.total}>'
+
+class SyncChange(db.Model):
+    __tablename__ = 'sync_changes'
+    
+    # Latest change of each synced row, tombstones included; maintained by app/sync.py
+    entity = db.Column(db.String(20), primary_key=True)
+    entity_id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    created_seq = db.Column(db.Integer, nullable=False, default=0)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    
+    __table_args__ = (
+        db.Index('ix_sync_changes_user_seq', 'user_id', 'seq'),
+        # Latest change per collection, for ETags (app/etags.py)
+        db.Index('ix_sync_changes_user_entity_seq', 'user_id', 'entity', 'seq'),
+        db.Index('uq_sync_changes_seq', 'seq', unique=True),
+    )
+    
+    def __repr__(self):
+        return f'<SyncChange {self.entity} {self.entity_id} @{self.seq}>'
+
+class SyncCounter(db.Model):
+    __tablename__ = 'sync_counter'
+    
+    # A single row (id 1) with the last sequence number handed out by app/sync.py
+    id = db.Column(db.Integer, primary_key=True)
+    last_seq = db.Column(db.Integer, nullable=False, default=0)
+
 class Habit(db.Model):
     __tablename__ = 'habits'
     
@@ -171,10 +224,15 @@ class Habit(db.Model):
     longest_streak = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
     reminder_time = db.Column(db.Time)
+    # 30-day completion rate as of stats_date; refreshed nightly by app/habit_refresh.py
+    completion_rate = db.Column(db.Float, nullable=False, default=0)
+    stats_date = db.Column(db.Date)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     habit_logs = db.relationship('HabitLog', backref='habit', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (db.Index('ix_habits_user_active', 'user_id', 'is_active'),)
+    
     def check_in(self, date_completed=None):
         if date_completed is None:
             date_completed = date.today()
@@ -192,46 +250,17 @@ class Habit(db.Model):
         return False
     
     def update_streak(self):
-        from datetime import timedelta
-        today = date.today()
-        current_streak = 0
-        
-        check_date = today
-        while True:
-            log = HabitLog.query.filter(
-                HabitLog.habit_id == self.id,
-                HabitLog.date_completed == check_date
-            ).first()
-            
-            if log:
-                current_streak += 1
-                if self.frequency == HabitFrequency.DAILY:
-                    check_date = check_date - timedelta(days=1)
-                elif self.frequency == HabitFrequency.WEEKLY:
-                    check_date = check_date - timedelta(days=7)
-                elif self.frequency == HabitFrequency.MONTHLY:
-                    # Go to first day of current month, then subtract one day to get last day of previous month
-                    first_of_month = check_date.replace(day=1)
-                    check_date = first_of_month - timedelta(days=1)
-            else:
-                break
-        
-        self.current_streak = current_streak
-        if current_streak > self.longest_streak:
-            self.longest_streak = current_streak
+        # One query for the log dates; streaks are computed in memory so the
+        # cost no longer grows with the length of the streak.
+        from app.streaks import refresh_streak
+        refresh_streak(self)
     
     def get_completion_rate(self, days=30):
-        from datetime import timedelta
-        end_date = date.today()
-        start_date = end_date - timedelta(days=days)
-        
-        total_days = days
-        completed_days = HabitLog.query.filter(
-            HabitLog.habit_id == self.id,
-            HabitLog.date_completed.between(start_date, end_date)
-        ).count()
-        
-        return (completed_days / total_days) * 100 if total_days > 0 else 0
+        from app.habit_stats import RATE_WINDOW, completion_rates, stored_rate
+        rate = stored_rate(self) if days == RATE_WINDOW else None
+        if rate is not None:
+            return rate
+        return completion_rates([self.id], days)[self.id]
     
     def __repr__(self):
         return f'<Habit {self.name}>'
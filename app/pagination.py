@@ -0,0 +1,116 @@
+"""Keyset (cursor) pagination.
+
+Pages are ordered descending by a tuple of columns that together are unique,
+e.g. ``(Transaction.transaction_date, Transaction.id)``. A cursor encodes the
+sort key of the row a page starts after plus the direction to move in, so
+every page is a single indexed range scan with ``LIMIT`` no matter how deep
+it is, and no ``COUNT(*)`` is needed to know whether more rows exist.
+
+``keyset_paginate`` takes either an ORM ``Query`` or a Core ``select()``; the
+latter runs on the session's connection and yields plain rows (see
+``app/readpath.py``).
+"""
+import base64
+from datetime import date, datetime
+import json
+import operator
+from sqlalchemy import Select, and_, func, or_, select
+from app import readpath
+
+class InvalidCursor(ValueError):
+    pass
+
+class KeysetPage:
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    def to_dict(self):
+        data = {
+            'per_page': self.per_page,
+            'has_next': self.has_next,
+            'has_prev': self.has_prev,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor
+        }
+        if self.total is not None:
+            data['total'] = self.total
+        return data
+
+def _dump(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def _load(value, column):
+    python_type = column.type.python_type
+    if python_type in (date, datetime):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+def encode_cursor(key, direction='next'):
+    payload = json.dumps([direction] + [_dump(v) for v in key], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b'=').decode()
+
+def decode_cursor(token, columns):
+    """Return ``(key, direction)``; raises ``InvalidCursor`` on tampered input."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, *values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('next', 'prev') or len(values) != len(columns):
+            raise ValueError(token)
+        return tuple(_load(v, c) for v, c in zip(values, columns)), direction
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor('Invalid cursor') from exc
+
+def _beyond(columns, key, compare):
+    """Rows strictly after ``key`` in lexicographic ``compare`` order."""
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == key[j] for j in range(i)]
+        clauses.append(and_(*equal, compare(column, key[i])))
+    return or_(*clauses)
+
+def _key_of(row, columns):
+    return tuple(getattr(row, column.key) for column in columns)
+
+def _count(query):
+    if isinstance(query, Select):
+        return readpath.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+    return query.order_by(None).count()
+
+def _all(query):
+    if isinstance(query, Select):
+        return readpath.fetch_all(query)
+    return query.all()
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, with_total=False):
+    """Fetch one page of ``query`` ordered by ``columns`` descending."""
+    key, direction = decode_cursor(cursor, columns) if cursor else (None, 'next')
+    total = _count(query) if with_total else None
+
+    if direction == 'prev':
+        page_query = query.filter(_beyond(columns, key, operator.gt))\
+                          .order_by(*[column.asc() for column in columns])
+    else:
+        page_query = query
+        if key is not None:
+            page_query = page_query.filter(_beyond(columns, key, operator.lt))
+        page_query = page_query.order_by(*[column.desc() for column in columns])
+
+    rows = _all(page_query.limit(per_page + 1))
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == 'prev':
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = key is not None, has_more
+
+    next_cursor = encode_cursor(_key_of(rows[-1], columns), 'next') if rows and has_next else None
+    prev_cursor = encode_cursor(_key_of(rows[0], columns), 'prev') if rows and has_prev else None
+    return KeysetPage(rows, per_page, has_next, has_prev, next_cursor, prev_cursor, total)
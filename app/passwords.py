@@ -0,0 +1,169 @@
+"""Password hashing on a bounded worker pool.
+
+Password hashes are deliberately slow. Running them on the request thread
+lets a burst of logins occupy every worker, so ``auth.login`` and
+``auth.register`` hand them to a small thread pool instead (hashlib releases
+the GIL while hashing, so other requests keep running). At most
+``PASSWORD_HASH_WORKERS`` hashes run at once and ``PASSWORD_HASH_QUEUE_LIMIT``
+more may wait; beyond that ``HashingOverloaded`` is raised right away and the
+routes answer 503 rather than queueing without bound.
+
+Stored hashes made with other parameters than ``PASSWORD_HASH_METHOD`` are
+replaced with a fresh hash on the next successful login.
+
+Configuration (all optional):
+
+``PASSWORD_HASH_METHOD``        Werkzeug method string, e.g. ``'pbkdf2:sha256:600000'``
+                                or ``'scrypt:32768:8:1'``
+``PASSWORD_HASH_WORKERS``       hashes computed concurrently
+``PASSWORD_HASH_QUEUE_LIMIT``   hashes allowed to wait for a worker
+``PASSWORD_HASH_TIMEOUT``       seconds a request waits for its hash
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import threading
+import time
+from flask import current_app, g, has_app_context, has_request_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+
+class HashingOverloaded(RuntimeError):
+    pass
+
+class HashMetrics:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.rehashed = 0
+        self._lock = threading.Lock()
+
+    def queued(self, delta):
+        with self._lock:
+            self.queue_depth += delta
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+
+    def hashed(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'hashes': self.count,
+                'mean_ms': round(self.total_seconds / self.count * 1000, 2) if self.count else None,
+                'max_ms': round(self.max_seconds * 1000, 2),
+                'queue_depth': self.queue_depth,
+                'peak_queue_depth': self.peak_queue_depth,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'rehashed': self.rehashed
+            }
+
+class HashingPool:
+    def __init__(self, workers=2, queue_limit=16, timeout=10):
+        self.timeout = timeout
+        self.metrics = HashMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    def _timed(self, func, args):
+        self.metrics.queued(-1)
+        started = time.perf_counter()
+        try:
+            return func(*args), time.perf_counter() - started
+        finally:
+            self.metrics.hashed(time.perf_counter() - started)
+
+    def run(self, func, *args):
+        """Run ``func(*args)`` on the pool and wait for the result."""
+        if not self._slots.acquire(blocking=False):
+            self.metrics.increment('rejected')
+            raise HashingOverloaded('Too many password hashes in progress')
+
+        self.metrics.queued(1)
+        try:
+            future = self._executor.submit(self._timed, func, args)
+        except BaseException:
+            self.metrics.queued(-1)
+            self._slots.release()
+            raise
+        # The slot is held until the hash finishes, even if the caller gives up
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result, elapsed = future.result(self.timeout)
+        except FutureTimeout:
+            self.metrics.increment('timeouts')
+            raise HashingOverloaded('Timed out waiting for a password hash')
+        if has_request_context():
+            g._hash_seconds = g.get('_hash_seconds', 0.0) + elapsed
+        return result
+
+def hash_method():
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    return DEFAULT_METHOD
+
+# Werkzeug fills in defaults ('scrypt' -> 'scrypt:32768:8:1'); ask it once per method
+_stored_methods = {}
+
+def _stored_method(method):
+    if method not in _stored_methods:
+        _stored_methods[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return _stored_methods[method]
+
+def needs_rehash(password_hash, method=None):
+    return password_hash.split('$', 1)[0] != _stored_method(method or hash_method())
+
+def _pool():
+    return current_app.extensions['password_hashing']
+
+def hash_password(password):
+    return _pool().run(generate_password_hash, password, hash_method())
+
+def verify_password(user, password):
+    """Check ``password`` for ``user`` off-thread, upgrading an outdated hash.
+
+    The caller commits; the new hash is only assigned to ``user``.
+    """
+    pool = _pool()
+    if not pool.run(check_password_hash, user.password_hash, password):
+        return False
+    method = hash_method()
+    if method not in _stored_methods:
+        # Normalizing the method costs one hash
+        pool.run(_stored_method, method)
+    if needs_rehash(user.password_hash, method):
+        user.password_hash = pool.run(generate_password_hash, password, method)
+        pool.metrics.increment('rehashed')
+    return True
+
+def metrics():
+    return _pool().metrics.as_dict()
+
+def _report_hash_time(response):
+    seconds = g.pop('_hash_seconds', None)
+    if seconds is not None:
+        response.headers.add('Server-Timing', f'hash;dur={seconds * 1000:.2f}')
+    return response
+
+def init_app(app):
+    app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+    app.config.setdefault('PASSWORD_HASH_QUEUE_LIMIT', 16)
+    app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+
+    app.extensions['password_hashing'] = HashingPool(app.config['PASSWORD_HASH_WORKERS'],
+                                                     app.config['PASSWORD_HASH_QUEUE_LIMIT'],
+                                                     app.config['PASSWORD_HASH_TIMEOUT'])
+    app.after_request(_report_hash_time)
@@ -0,0 +1,78 @@
+"""Read-only query path for list and report endpoints.
+
+Statements built here select plain table columns and run on the session's
+connection through Core: rows come back as tuple-backed ``Row`` objects, and
+no ORM instances, identity-map entries or attribute-change tracking are
+created for them. Use it for pages that only display or export rows; anything
+that modifies rows must keep loading ORM objects.
+
+    statement = transactions_select(user_id).order_by(Transaction.id).limit(50)
+    records = transaction_records(fetch_all(statement))
+"""
+from sqlalchemy import select
+from app import db
+from app.models import Transaction, Category
+
+def execute(statement):
+    return db.session.connection().execute(statement)
+
+def fetch_all(statement):
+    return execute(statement).all()
+
+def stream(statement, batch_size=1000):
+    """Yield lists of rows, fetched ``batch_size`` at a time with a server-side cursor."""
+    result = execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+class CategoryRef:
+    __slots__ = ('id', 'name', 'color', 'icon')
+
+    def __init__(self, id, name, color, icon):
+        self.id = id
+        self.name = name
+        self.color = color
+        self.icon = icon
+
+class TransactionRecord:
+    """Read-only stand-in for a ``Transaction`` with its ``category``."""
+    __slots__ = ('id', 'amount', 'type', 'description', 'transaction_date', 'created_at', 'category')
+
+    def __init__(self, id, amount, type, description, transaction_date, created_at, category):
+        self.id = id
+        self.amount = amount
+        self.type = type
+        self.description = description
+        self.transaction_date = transaction_date
+        self.created_at = created_at
+        self.category = category
+
+_transactions = Transaction.__table__
+_categories = Category.__table__
+
+def transactions_select(user_id):
+    """Columns for ``TransactionRecord`` with the category joined, for one user."""
+    return select(
+        _transactions.c.id,
+        _transactions.c.amount,
+        _transactions.c.type,
+        _transactions.c.description,
+        _transactions.c.transaction_date,
+        _transactions.c.created_at,
+        _categories.c.id.label('category__id'),
+        _categories.c.name.label('category__name'),
+        _categories.c.color.label('category__color'),
+        _categories.c.icon.label('category__icon')
+    ).join_from(_transactions, _categories, _transactions.c.category_id == _categories.c.id)\
+     .where(_transactions.c.user_id == user_id)
+
+def transaction_records(rows):
+    # Categories repeat across rows; share one ref per category
+    categories = {}
+    records = []
+    for id, amount, type, description, transaction_date, created_at, *category in rows:
+        ref = categories.get(category[0])
+        if ref is None:
+            ref = categories[category[0]] = CategoryRef(*category)
+        records.append(TransactionRecord(id, amount, type, description, transaction_date, created_at, ref))
+    return records
@@ -0,0 +1,176 @@
+"""Monthly transaction rollups.
+
+``transaction_rollups`` holds one row per user, calendar month, category and
+type with the summed amount and the number of transactions. Every flush that
+creates, edits or deletes a ``Transaction`` adjusts the affected rows on the
+same connection, like the balance totals in ``app/ledger.py``, so reports read
+a handful of rows per month instead of scanning the user's transactions.
+
+Databases that predate the table are backfilled by ``upgrade_schema`` when it
+creates the table; ``flask transactions rebuild-rollups`` recomputes it at any
+time.
+"""
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import and_, event, extract, func, select
+from app import db
+from app.derived import to_decimal
+from app.ledger import transaction_changes, deleted_user_ids
+from app.models import Transaction, TransactionRollup, TransactionType
+
+def _key(values):
+    transaction_type = values['type']
+    if not isinstance(transaction_type, TransactionType):
+        transaction_type = TransactionType(transaction_type)
+    day = values['transaction_date']
+    return (values['user_id'], day.year, day.month, values['category_id'], transaction_type)
+
+def _add(deltas, values, sign=1):
+    key = _key(values)
+    total, count = deltas.get(key, (Decimal('0'), 0))
+    deltas[key] = (total + sign * to_decimal(values['amount']), count + sign)
+
+def _collect_deltas(session):
+    deltas = {}
+    for sign, values in transaction_changes(session):
+        _add(deltas, values, sign)
+
+    deleted_users = deleted_user_ids(session)
+    # An edit that keeps the month, category and type cancels out
+    return {key: delta for key, delta in deltas.items()
+            if key[0] not in deleted_users and delta != (0, 0)}
+
+def _key_clause(table, key):
+    user_id, year, month, category_id, transaction_type = key
+    return and_(table.c.user_id == user_id,
+                table.c.year == year,
+                table.c.month == month,
+                table.c.category_id == category_id,
+                table.c.type == transaction_type)
+
+def _month_bounds(year, month):
+    start = date(year, month, 1)
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+def _sum_key(connection, key):
+    user_id, year, month, category_id, transaction_type = key
+    start, end = _month_bounds(year, month)
+    return connection.execute(
+        select(func.sum(Transaction.amount), func.count(Transaction.id))
+        .where(Transaction.user_id == user_id,
+               Transaction.type == transaction_type,
+               Transaction.transaction_date >= start,
+               Transaction.transaction_date < end,
+               Transaction.category_id == category_id)
+    ).one()
+
+def apply_deltas(connection, deltas):
+    """Add ``{(user_id, year, month, category_id, type): (total, count)}`` to the rollups.
+
+    A missing row is built from the transactions it covers, which at this point
+    already include the rows being written. Rows left with no transactions are
+    removed.
+    """
+    table = TransactionRollup.__table__
+    for key, (total, count) in deltas.items():
+        clause = _key_clause(table, key)
+        result = connection.execute(
+            table.update().where(clause)
+            .values(total=table.c.total + total, count=table.c.count + count)
+        )
+        if result.rowcount == 0:
+            key_total, key_count = _sum_key(connection, key)
+            if key_count:
+                user_id, year, month, category_id, transaction_type = key
+                connection.execute(table.insert().values(
+                    user_id=user_id, year=year, month=month, category_id=category_id,
+                    type=transaction_type, total=to_decimal(key_total), count=key_count
+                ))
+        elif count < 0:
+            connection.execute(table.delete().where(clause, table.c.count <= 0))
+
+def add_rows(connection, rows):
+    """Apply rollup deltas for transaction rows inserted with Core statements."""
+    deltas = {}
+    for values in rows:
+        _add(deltas, values)
+    apply_deltas(connection, deltas)
+
+@event.listens_for(db.session, 'after_flush')
+def _maintain_rollups(session, flush_context):
+    deltas = _collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+def rebuild(user_id=None):
+    """Recompute the rollups (for one user, or everyone) and commit. Returns the row count."""
+    table = TransactionRollup.__table__
+    connection = db.session.connection()
+
+    source = select(
+        Transaction.user_id,
+        extract('year', Transaction.transaction_date),
+        extract('month', Transaction.transaction_date),
+        Transaction.category_id,
+        Transaction.type,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id)
+    )
+    delete = table.delete()
+    if user_id is not None:
+        source = source.where(Transaction.user_id == user_id)
+        delete = delete.where(table.c.user_id == user_id)
+    source = source.group_by(*source.selected_columns[:5])
+
+    connection.execute(delete)
+    connection.execute(table.insert().from_select(
+        ['user_id', 'year', 'month', 'category_id', 'type', 'total', 'count'], source
+    ))
+    db.session.commit()
+
+    count = db.session.query(func.count()).select_from(TransactionRollup)
+    if user_id is not None:
+        count = count.filter(TransactionRollup.user_id == user_id)
+    return count.scalar()
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+def monthly_totals(user_id, start, end):
+    """Income and expenses per month from ``start`` to ``end`` inclusive.
+
+    ``start`` and ``end`` are ``(year, month)`` tuples. Returns one dict per
+    month, oldest first, with ``year``, ``month``, ``income`` and ``expenses``;
+    months without transactions are included with zero totals.
+    """
+    first, last = _month_index(*start), _month_index(*end)
+    months = {}
+    for index in range(first, last + 1):
+        year, month = divmod(index, 12)
+        months[index] = {'year': year, 'month': month + 1,
+                         'income': Decimal('0'), 'expenses': Decimal('0')}
+
+    rows = db.session.query(
+        TransactionRollup.year,
+        TransactionRollup.month,
+        TransactionRollup.type,
+        func.sum(TransactionRollup.total)
+    ).filter(
+        TransactionRollup.user_id == user_id,
+        TransactionRollup.year.between(start[0], end[0])
+    ).group_by(TransactionRollup.year, TransactionRollup.month, TransactionRollup.type)
+
+    for year, month, transaction_type, total in rows:
+        entry = months.get(_month_index(year, month))
+        if entry is None:
+            continue
+        field = 'income' if transaction_type == TransactionType.INCOME else 'expenses'
+        entry[field] = to_decimal(total)
+    return list(months.values())
+
+def month_totals(user_id, day=None):
+    """``(income, expenses)`` for the calendar month containing ``day`` (default today)."""
+    day = day or date.today()
+    entry = monthly_totals(user_id, (day.year, day.month), (day.year, day.month))[0]
+    return entry['income'], entry['expenses']
@@ -1,30 +1,41 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
-from app import db
+from app import db, batch, cache, checkins, importer, ledger, readpath, rollups, serializers, sync, category_stats, habit_stats
+from app.database import retry_on_busy
+from app.etags import conditional
+from app.pagination import keyset_paginate, InvalidCursor
 from app.models import Goal, Transaction, Habit, Category, GoalStatus, TransactionType, HabitFrequency
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from decimal import Decimal, InvalidOperation
+import io
 from sqlalchemy import desc
 
 api_bp = Blueprint('api', __name__)
 
+# Longest window /api/habits/calendar serves in one response (about five years)
+CALENDAR_MAX_DAYS = 366 * 5
+
+@api_bp.errorhandler(serializers.UnknownFields)
+def unknown_fields(error):
+    return jsonify({'error': str(error)}), 400
+
+def _selection(serializer, extra=()):
+    """Columns and row serializer for the request's ``fields`` parameter."""
+    return serializer.select(serializer.parse(request.args.get('fields')), extra)
+
 # Goals API endpoints
 @api_bp.route('/goals', methods=['GET'])
 @login_required
+@conditional('goals', 'milestones')
 def get_goals():
-    goals = Goal.query.filter_by(user_id=current_user.id).order_by(desc(Goal.created_at)).all()
-    return jsonify([{
-        'id': goal.id,
-        'title': goal.title,
-        'description': goal.description,
-        'target_date': goal.target_date.isoformat() if goal.target_date else None,
-        'status': goal.status.value,
-        'progress_percentage': goal.progress_percentage,
-        'created_at': goal.created_at.isoformat(),
-        'days_remaining': goal.days_remaining()
-    } for goal in goals])
+    selection = _selection(serializers.goals)
+    rows = readpath.fetch_all(selection.statement().where(Goal.user_id == current_user.id)
+                              .order_by(desc(Goal.created_at)))
+    return jsonify(selection.dump(rows))
 
 @api_bp.route('/goals', methods=['POST'])
 @login_required
+@retry_on_busy
 def create_goal_api():
     data = request.get_json()
     
@@ -53,6 +64,7 @@ def create_goal_api():
 
 @api_bp.route('/goals/<id>', methods=['PUT'])
 @login_required
+@retry_on_busy
 def update_goal_api(id):
     goal = Goal.query.filter_by(id=id, user_id=current_user.id).first_or_404()
     data = request.get_json()
@@ -73,6 +85,7 @@ def update_goal_api(id):
 
 @api_bp.route('/goals/<id>', methods=['DELETE'])
 @login_required
+@retry_on_busy
 def delete_goal_api(id):
     goal = Goal.query.filter_by(id=id, user_id=current_user.id).first_or_404()
     db.session.delete(goal)
@@ -82,41 +95,40 @@ def delete_goal_api(id):
 # Transactions API endpoints
 @api_bp.route('/transactions', methods=['GET'])
 @login_required
+@conditional('transactions', 'categories')
 def get_transactions():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    type_filter = request.args.get('type')
+    category_filter = request.args.get('category_id')
+    with_total = request.args.get('with_total', 'false').lower() == 'true'
     
-    transactions = Transaction.query.filter_by(user_id=current_user.id)\
-                                  .order_by(desc(Transaction.transaction_date))\
-                                  .paginate(page=page, per_page=per_page, error_out=False)
+    selection = _selection(serializers.transactions, extra=(Transaction.transaction_date,))
+    query = selection.statement().where(Transaction.user_id == current_user.id)
+    if type_filter:
+        try:
+            query = query.where(Transaction.type == TransactionType(type_filter))
+        except ValueError:
+            return jsonify({'error': 'Invalid transaction type'}), 400
+    if category_filter:
+        query = query.where(Transaction.category_id == category_filter)
+    
+    try:
+        transactions = keyset_paginate(query,
+                                       [Transaction.transaction_date, Transaction.id],
+                                       cursor=request.args.get('cursor'),
+                                       per_page=per_page,
+                                       with_total=with_total)
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
     return jsonify({
-        'transactions': [{
-            'id': t.id,
-            'amount': float(t.amount),
-            'type': t.type.value,
-            'category': {
-                'id': t.category.id,
-                'name': t.category.name,
-                'color': t.category.color,
-                'icon': t.category.icon
-            },
-            'description': t.description,
-            'transaction_date': t.transaction_date.isoformat(),
-            'created_at': t.created_at.isoformat()
-        } for t in transactions.items],
-        'pagination': {
-            'page': transactions.page,
-            'pages': transactions.pages,
-            'per_page': transactions.per_page,
-            'total': transactions.total,
-            'has_next': transactions.has_next,
-            'has_prev': transactions.has_prev
-        }
+        'transactions': selection.dump(transactions.items),
+        'pagination': transactions.to_dict()
     })
 
 @api_bp.route('/transactions', methods=['POST'])
 @login_required
+@retry_on_busy
 def create_transaction_api():
     data = request.get_json()
     
@@ -152,54 +164,127 @@ def create_transaction_api():
         'created_at': transaction.created_at.isoformat()
     }), 201
 
+@api_bp.route('/transactions/<id>', methods=['PUT'])
+@login_required
+@retry_on_busy
+def update_transaction_api(id):
+    transaction = Transaction.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        amount = Decimal(str(data['amount'])) if 'amount' in data else transaction.amount
+        transaction_type = TransactionType(data['type']) if 'type' in data else transaction.type
+        if 'transaction_date' in data:
+            transaction_date = datetime.strptime(data['transaction_date'], '%Y-%m-%d').date()
+    except (TypeError, ValueError, InvalidOperation):
+        return jsonify({'error': 'Invalid amount, transaction type or date'}), 400
+    if not amount.is_finite() or not 0 < amount <= importer.MAX_AMOUNT:
+        return jsonify({'error': 'Amount must be a positive number'}), 400
+    
+    if 'category_id' in data:
+        if not Category.query.filter_by(id=data['category_id'], user_id=current_user.id).first():
+            return jsonify({'error': 'Unknown category'}), 400
+    
+    # Same rule as creating an expense: an edit may not overdraw the balance
+    income, expenses = ledger.get_totals(current_user.id)
+    current_balance = income - expenses
+    old_effect = transaction.amount if transaction.type == TransactionType.INCOME else -transaction.amount
+    new_effect = amount if transaction_type == TransactionType.INCOME else -amount
+    new_balance = current_balance - old_effect + new_effect
+    if new_balance < 0 and new_balance < current_balance:
+        return jsonify({'error': f'Insufficient funds. Current balance: ${current_balance:.2f}'}), 400
+    
+    if 'category_id' in data:
+        transaction.category_id = data['category_id']
+    if 'amount' in data:
+        transaction.amount = amount
+    if 'type' in data:
+        transaction.type = transaction_type
+    if 'description' in data:
+        transaction.description = data['description']
+    if 'transaction_date' in data:
+        transaction.transaction_date = transaction_date
+    
+    db.session.commit()
+    
+    return jsonify({'message': 'Transaction updated successfully'})
+
+@api_bp.route('/transactions/<id>', methods=['DELETE'])
+@login_required
+@retry_on_busy
+def delete_transaction_api(id):
+    transaction = Transaction.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    db.session.delete(transaction)
+    db.session.commit()
+    return jsonify({'message': 'Transaction deleted successfully'})
+
+@api_bp.route('/transactions/import', methods=['POST'])
+@login_required
+def import_transactions_api():
+    partial = request.args.get('partial', 'false').lower() == 'true'
+    create_categories = request.args.get('create_categories', 'false').lower() == 'true'
+    
+    if request.mimetype == 'text/csv':
+        rows = importer.read_csv(io.StringIO(request.get_data(as_text=True), newline=''))
+    elif 'file' in request.files:
+        rows = importer.read_csv(io.TextIOWrapper(request.files['file'].stream, encoding='utf-8-sig', newline=''))
+    else:
+        rows = request.get_json(silent=True)
+        if isinstance(rows, dict):
+            partial = rows.get('partial', partial)
+            create_categories = rows.get('create_categories', create_categories)
+            rows = rows.get('transactions')
+        if not isinstance(rows, list):
+            return jsonify({'error': 'Expected a JSON array of transactions or a CSV body'}), 400
+    
+    result = importer.import_transactions(current_user.id, rows,
+                                          partial=partial,
+                                          create_categories=create_categories)
+    status = 201 if result.imported else (400 if result.errors else 200)
+    return jsonify(result.to_dict()), status
+
 @api_bp.route('/transactions/summary', methods=['GET'])
 @login_required
+@conditional('transactions')
 def get_transaction_summary():
+    return jsonify(cache.cached('transaction-summary', lambda: _transaction_summary(current_user.id),
+                                current_user.id, depends_on=('transactions',)))
+
+def _transaction_summary(user_id):
     # Current balance
-    balance = current_user.get_balance()
+    income, expenses = ledger.get_totals(user_id)
     
     # This month's totals
-    current_month_start = date.today().replace(day=1)
-    monthly_income = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == current_user.id,
-        Transaction.type == TransactionType.INCOME,
-        Transaction.transaction_date >= current_month_start
-    ).scalar() or 0
-    
-    monthly_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == current_user.id,
-        Transaction.type == TransactionType.EXPENSE,
-        Transaction.transaction_date >= current_month_start
-    ).scalar() or 0
+    monthly_income, monthly_expenses = rollups.month_totals(user_id)
     
-    return jsonify({
-        'balance': float(balance),
+    return {
+        'balance': float(income - expenses),
         'monthly_income': float(monthly_income),
         'monthly_expenses': float(monthly_expenses),
         'monthly_net': float(monthly_income) - float(monthly_expenses)
-    })
+    }
 
 # Habits API endpoints
 @api_bp.route('/habits', methods=['GET'])
 @login_required
+@conditional('habits', 'habit_logs')
 def get_habits():
-    habits = Habit.query.filter_by(user_id=current_user.id).order_by(Habit.created_at.desc()).all()
-    return jsonify([{
-        'id': habit.id,
-        'name': habit.name,
-        'description': habit.description,
-        'frequency': habit.frequency.value,
-        'target_count': habit.target_count,
-        'current_streak': habit.current_streak,
-        'longest_streak': habit.longest_streak,
-        'is_active': habit.is_active,
-        'reminder_time': habit.reminder_time.strftime('%H:%M') if habit.reminder_time else None,
-        'completion_rate': habit.get_completion_rate(),
-        'created_at': habit.created_at.isoformat()
-    } for habit in habits])
+    try:
+        windows = [int(days) for days in request.args.get('windows', '7,30,90').split(',') if days.strip()]
+    except ValueError:
+        return jsonify({'error': 'windows must be a comma-separated list of day counts'}), 400
+    if not windows or any(days < 1 or days > 365 for days in windows) or len(windows) > 5:
+        return jsonify({'error': 'windows must hold 1-5 day counts between 1 and 365'}), 400
+    
+    # Completion statistics are only computed when a field that needs them is selected
+    selection = _selection(serializers.habits)
+    rows = readpath.fetch_all(selection.statement().where(Habit.user_id == current_user.id)
+                              .order_by(Habit.created_at.desc()))
+    return jsonify(selection.dump(rows, windows=windows))
 
 @api_bp.route('/habits', methods=['POST'])
 @login_required
+@retry_on_busy
 def create_habit_api():
     data = request.get_json()
     
@@ -243,8 +328,43 @@ def create_habit_api():
         'created_at': habit.created_at.isoformat()
     }), 201
 
+@api_bp.route('/habits/calendar', methods=['GET'])
+@login_required
+@conditional('habits', 'habit_logs')
+def get_habit_calendar():
+    today = date.today()
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else today
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') \
+            else end - timedelta(days=89)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    if (end - start).days >= CALENDAR_MAX_DAYS:
+        return jsonify({'error': f'Windows are limited to {CALENDAR_MAX_DAYS} days'}), 400
+    
+    habits = Habit.query.with_entities(Habit.id, Habit.name, Habit.frequency)\
+        .filter_by(user_id=current_user.id, is_active=True)\
+        .order_by(Habit.created_at).all()
+    runs = habit_stats.completion_runs([habit.id for habit in habits], start, end)
+    
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': (end - start).days + 1,
+        'habits': [{
+            'id': habit.id,
+            'name': habit.name,
+            'frequency': habit.frequency.value,
+            'completed': sum(length for _, length in runs[habit.id]),
+            'runs': runs[habit.id]
+        } for habit in habits]
+    })
+
 @api_bp.route('/habits/<id>/checkin', methods=['POST'])
 @login_required
+@retry_on_busy
 def checkin_habit_api(id):
     habit = Habit.query.filter_by(id=id, user_id=current_user.id).first_or_404()
     
@@ -271,15 +391,124 @@ def checkin_habit_api(id):
     else:
         return jsonify({'error': 'Already checked in for this date'}), 400
 
+@api_bp.route('/habits/checkins', methods=['POST'])
+@login_required
+@retry_on_busy
+def batch_checkin_api():
+    data = request.get_json(silent=True) or {}
+    items = data.get('checkins')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'checkins must be a non-empty list'}), 400
+    
+    try:
+        results, habits = checkins.check_in_many(current_user.id, items)
+    except checkins.BatchTooLarge as e:
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    
+    return jsonify({
+        'created': sum(1 for result in results if result['status'] == 'created'),
+        'results': results,
+        'habits': {habit.id: {
+            'current_streak': habit.current_streak,
+            'longest_streak': habit.longest_streak
+        } for habit in habits.values()}
+    })
+
 # Categories API endpoint
 @api_bp.route('/categories', methods=['GET'])
 @login_required
+@conditional('categories', 'transactions')
 def get_categories():
+    selection = _selection(serializers.categories)
+    rows = readpath.fetch_all(selection.statement().where(Category.user_id == current_user.id))
+    return jsonify(selection.dump(rows, user_id=current_user.id))
+
+@api_bp.route('/categories', methods=['POST'])
+@login_required
+@retry_on_busy
+def create_category_api():
+    data = request.get_json() or {}
+    
+    if not data.get('name'):
+        return jsonify({'error': 'Name is required'}), 400
+    if Category.query.filter_by(user_id=current_user.id, name=data['name']).first():
+        return jsonify({'error': 'Category name already exists'}), 400
+    
+    category = Category(
+        user_id=current_user.id,
+        name=data['name'],
+        color=data.get('color', '#6B7280'),
+        icon=data.get('icon', '📊')
+    )
+    db.session.add(category)
+    db.session.commit()
+    
+    return jsonify({
+        'id': category.id,
+        'name': category.name,
+        'color': category.color,
+        'icon': category.icon,
+        'is_default': category.is_default
+    }), 201
+
+@api_bp.route('/categories/stats', methods=['GET'])
+@login_required
+@conditional('categories', 'transactions')
+def get_category_stats():
+    type_filter = request.args.get('type')
+    try:
+        transaction_type = TransactionType(type_filter) if type_filter else None
+    except ValueError:
+        return jsonify({'error': 'Invalid transaction type'}), 400
+    
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
     categories = Category.query.filter_by(user_id=current_user.id).all()
+    stats = category_stats.category_totals(current_user.id,
+                                           [category.id for category in categories],
+                                           start_date=start_date,
+                                           end_date=end_date,
+                                           transaction_type=transaction_type)
+    
     return jsonify([{
         'id': category.id,
         'name': category.name,
         'color': category.color,
         'icon': category.icon,
-        'is_default': category.is_default
-    } for category in categories])
\ No newline at end of file
+        'count': stats[category.id]['count'],
+        'income': float(stats[category.id]['income']),
+        'expenses': float(stats[category.id]['expenses'])
+    } for category in categories])
+
+# Delta sync for offline clients
+@api_bp.route('/sync', methods=['GET'])
+@login_required
+def sync_api():
+    since = request.args.get('since')
+    limit = max(1, min(request.args.get('limit', sync.PAGE_SIZE, type=int), sync.MAX_PAGE_SIZE))
+    if not since:
+        return jsonify(sync.snapshot(current_user.id))
+    
+    try:
+        return jsonify(sync.changes_since(current_user.id, sync.parse_token(since), limit))
+    except sync.InvalidToken as e:
+        return jsonify({'error': str(e)}), 400
+
+# Many writes in one request and one commit
+@api_bp.route('/batch', methods=['POST'])
+@login_required
+@retry_on_busy
+def batch_api():
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        committed, results = batch.run(data.get('operations'), data.get('mode', 'atomic'))
+    except batch.InvalidBatch as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'committed': committed, 'results': results}), 200 if committed else 409
@@ -1,12 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response
 from flask_login import login_user, logout_user, current_user
-from app import db
+from app import db, passwords
 from app.models import User
 from app.forms import LoginForm, RegistrationForm
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
 
+def _overloaded(template, form):
+    flash('The server is busy right now. Please try again in a moment.', 'error')
+    response = make_response(render_template(template, form=form), 503)
+    response.headers['Retry-After'] = '1'
+    return response
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -16,7 +22,13 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         
-        if user and user.check_password(form.password.data):
+        try:
+            valid = user is not None and passwords.verify_password(user, form.password.data)
+        except passwords.HashingOverloaded:
+            return _overloaded('auth/login.html', form)
+        
+        if valid:
+            # Also saves a rehashed password when the hash settings changed
             user.last_login = datetime.utcnow()
             db.session.commit()
             login_user(user, remember=True)
@@ -50,7 +62,10 @@ def register():
                 username=form.username.data,
                 email=form.email.data
             )
-            user.set_password(form.password.data)
+            try:
+                user.password_hash = passwords.hash_password(form.password.data)
+            except passwords.HashingOverloaded:
+                return _overloaded('auth/register.html', form)
             db.session.add(user)
             db.session.commit()
             
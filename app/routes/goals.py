@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from app import db
-from app.models import Goal, Milestone, GoalStatus
+import click
+from app import db, goal_progress
+from app.models import User, Goal, Milestone, GoalStatus
 from app.forms import GoalForm, MilestoneForm
 from datetime import datetime
 
@@ -103,8 +104,7 @@ def create_milestone(goal_id):
             target_date=form.target_date.data
         )
         db.session.add(milestone)
-        db.session.commit()
-        goal.update_progress()
+        # Goal counters and progress are updated in the same flush (app/goal_progress.py)
         db.session.commit()
         flash('Milestone created successfully!', 'success')
         return redirect(url_for('goals.view_goal', id=goal.id))
@@ -136,10 +136,21 @@ def delete_milestone(id):
         Goal.user_id == current_user.id
     ).first_or_404()
     
-    goal = milestone.goal
     db.session.delete(milestone)
     db.session.commit()
-    goal.update_progress()
-    db.session.commit()
     
-    return jsonify({'success': True, 'message': 'Milestone deleted successfully!'})
\ No newline at end of file
+    return jsonify({'success': True, 'message': 'Milestone deleted successfully!'})
+
+@goals_bp.cli.command('rebuild-counters')
+@click.option('--user', 'username', help='Only rebuild this user\'s goals.')
+def rebuild_counters(username):
+    """Recompute goal milestone counters and progress from the milestones table."""
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.UsageError(f'No user named {username}.')
+        user_id = user.id
+    
+    count = goal_progress.rebuild(user_id)
+    click.echo(f'{count} goal(s) updated.')
@@ -1,10 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from app import db
+from app import db, habit_refresh, habit_stats
 from app.models import Habit, HabitLog, HabitFrequency
 from app.forms import HabitForm, HabitCheckInForm
 from datetime import datetime, date, timedelta
 from sqlalchemy import desc, func
+import click
 
 habits_bp = Blueprint('habits', __name__)
 
@@ -19,15 +20,10 @@ def list_habits():
     
     habits = query.order_by(Habit.created_at.desc()).all()
     
-    # Check today's completion status for each habit
-    today = date.today()
-    for habit in habits:
-        habit.completed_today = HabitLog.query.filter_by(
-            habit_id=habit.id,
-            date_completed=today
-        ).first() is not None
+    # Today's status, completion rates and live streaks for all habits at once
+    summaries = habit_stats.habit_summaries(habits)
     
-    return render_template('habits/list.html', habits=habits, active_only=active_only)
+    return render_template('habits/list.html', habits=habits, active_only=active_only, summaries=summaries)
 
 @habits_bp.route('/create', methods=['GET', 'POST'])
 @login_required
@@ -177,28 +173,21 @@ def remove_checkin(log_id):
 @habits_bp.route('/calendar')
 @login_required
 def calendar_view():
-    # Get all habits for the current user
-    habits = Habit.query.filter_by(user_id=current_user.id, is_active=True).all()
-    
-    # Get habit logs for the last 3 months
-    three_months_ago = date.today() - timedelta(days=90)
-    logs = db.session.query(HabitLog)\
-                    .join(Habit)\
-                    .filter(Habit.user_id == current_user.id,
-                           HabitLog.date_completed >= three_months_ago)\
-                    .all()
-    
-    # Organize logs by date and habit
-    calendar_data = {}
-    for log in logs:
-        date_str = log.date_completed.strftime('%Y-%m-%d')
-        if date_str not in calendar_data:
-            calendar_data[date_str] = []
-        calendar_data[date_str].append({
-            'habit_id': log.habit_id,
-            'habit_name': log.habit.name
-        })
+    # Only the habit list is rendered here; the grid fetches its data per month
+    # from /api/habits/calendar as the user pages through it.
+    habits = Habit.query.filter_by(user_id=current_user.id, is_active=True)\
+        .order_by(Habit.created_at).all()
     
-    return render_template('habits/calendar.html', 
-                         habits=habits, 
-                         calendar_data=calendar_data)
\ No newline at end of file
+    return render_template('habits/calendar.html', habits=habits)
+
+@habits_bp.cli.command('refresh-stats')
+@click.option('--workers', default=1, show_default=True, help='Processes to spread the users over.')
+@click.option('--chunk-size', default=habit_refresh.CHUNK_SIZE, show_default=True, help='Users per UPDATE batch and commit.')
+@click.option('--force', is_flag=True, help='Also recompute habits already refreshed today.')
+def refresh_stats(workers, chunk_size, force):
+    """Recompute streaks and 30-day completion rates of every habit."""
+    def progress(stats, users):
+        click.echo(f'  {stats.users}/{users} users, {stats.habits} habits, {stats.logs} logs, {stats.seconds:.1f}s')
+    
+    stats = habit_refresh.refresh_all(chunk_size=chunk_size, workers=workers, force=force, progress=progress)
+    click.echo(f'Refreshed {stats.summary()}.')
@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, jsonify, redirect, url_for
 from flask_login import login_required, current_user
-from app.models import Goal, Transaction, Habit, HabitLog, TransactionType, GoalStatus
-from app import db
+from app.models import Goal, Transaction, Habit, TransactionType, GoalStatus
+from app import db, cache, habit_stats, ledger, rollups
+from app.etags import conditional
 from datetime import date, datetime, timedelta
 from sqlalchemy import func, desc
+from sqlalchemy.orm import joinedload
 
 main_bp = Blueprint('main', __name__)
 
@@ -13,56 +15,59 @@ def index():
         return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
+def _dashboard_totals(user_id):
+    goal_counts = dict(db.session.query(Goal.status, func.count(Goal.id))
+                       .filter(Goal.user_id == user_id)
+                       .group_by(Goal.status).all())
+    total_income, total_expenses = ledger.get_totals(user_id)
+    monthly_income, monthly_expenses = rollups.month_totals(user_id)
+    return {
+        'goal_counts': goal_counts,
+        'current_balance': float(total_income - total_expenses),
+        'monthly_income': monthly_income,
+        'monthly_expenses': monthly_expenses
+    }
+
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
+    # Every lookup below is a single (grouped) query, so the number of
+    # statements per render does not depend on how many goals, habits or
+    # transactions the user has. The aggregates are cached per user until
+    # one of the collections they are computed from changes (see app/cache.py).
+    totals = cache.cached('dashboard', lambda: _dashboard_totals(current_user.id), current_user.id,
+                          depends_on=('goals', 'transactions'))
+    
     # Goals statistics
-    total_goals = Goal.query.filter_by(user_id=current_user.id).count()
-    active_goals = Goal.query.filter_by(user_id=current_user.id, status=GoalStatus.ACTIVE).count()
-    completed_goals = Goal.query.filter_by(user_id=current_user.id, status=GoalStatus.COMPLETED).count()
+    goal_counts = totals['goal_counts']
+    total_goals = sum(goal_counts.values())
+    active_goals = goal_counts.get(GoalStatus.ACTIVE, 0)
+    completed_goals = goal_counts.get(GoalStatus.COMPLETED, 0)
     
     # Recent goals
     recent_goals = Goal.query.filter_by(user_id=current_user.id)\
         .order_by(desc(Goal.created_at)).limit(5).all()
     
     # Financial statistics
-    current_balance = current_user.get_balance()
-    
-    # This month's transactions
-    current_month_start = date.today().replace(day=1)
-    monthly_income = db.session.query(func.sum(Transaction.amount)).filter(
-        Transaction.user_id == current_user.id,
-        Transaction.type == TransactionType.INCOME,
-        Transaction.transaction_date >= current_month_start
-    ).scalar() or 0
-    
-    monthly_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-        Transaction.user_id == current_user.id,
-        Transaction.type == TransactionType.EXPENSE,
-        Transaction.transaction_date >= current_month_start
-    ).scalar() or 0
+    current_balance = totals['current_balance']
+    monthly_income = totals['monthly_income']
+    monthly_expenses = totals['monthly_expenses']
     
     # Recent transactions
     recent_transactions = Transaction.query.filter_by(user_id=current_user.id)\
+        .options(joinedload(Transaction.category))\
         .order_by(desc(Transaction.created_at)).limit(5).all()
     
     # Habits statistics
-    active_habits = Habit.query.filter_by(user_id=current_user.id, is_active=True).count()
-    
-    # Today's habits completion
-    today_completed_habits = 0
     user_habits = Habit.query.filter_by(user_id=current_user.id, is_active=True).all()
-    for habit in user_habits:
-        log = HabitLog.query.filter_by(habit_id=habit.id, date_completed=date.today()).first()
-        if log:
-            today_completed_habits += 1
+    active_habits = len(user_habits)
     
-    # Recent habit activity
-    recent_habit_logs = db.session.query(HabitLog)\
-        .join(Habit)\
-        .filter(Habit.user_id == current_user.id)\
-        .order_by(desc(HabitLog.created_at))\
-        .limit(5).all()
+    # Today's habits completion, 30-day rates and live streaks
+    habit_summaries = cache.cached('habit-summaries',
+                                   lambda: habit_stats.habit_summaries(user_habits, windows=(30,)),
+                                   current_user.id, depends_on=('habits', 'habit_logs'), args=(30,))
+    today_completed_habits = sum(1 for summary in habit_summaries.values() if summary['completed_today'])
+    pending_habit_ids = [habit.id for habit in user_habits if not habit_summaries[habit.id]['completed_today']]
     
     return render_template('dashboard.html',
                          total_goals=total_goals,
@@ -76,32 +81,49 @@ def dashboard():
                          active_habits=active_habits,
                          today_completed_habits=today_completed_habits,
                          user_habits=user_habits,
-                         recent_habit_logs=recent_habit_logs)
+                         habit_summaries=habit_summaries,
+                         pending_habit_ids=pending_habit_ids)
 
 @main_bp.route('/api/dashboard-stats')
 @login_required
+@conditional('transactions', 'goals')
 def dashboard_stats():
+    return jsonify(cache.cached('dashboard-stats', lambda: _dashboard_stats(current_user.id), current_user.id,
+                                depends_on=('transactions', 'goals')))
+
+def _dashboard_stats(user_id):
     # Spending by category (last 30 days)
     thirty_days_ago = date.today() - timedelta(days=30)
     spending_data = db.session.query(
         Transaction.category_id,
         func.sum(Transaction.amount).label('total')
     ).join(Transaction.category)\
-     .filter(Transaction.user_id == current_user.id,
+     .filter(Transaction.user_id == user_id,
             Transaction.type == TransactionType.EXPENSE,
             Transaction.transaction_date >= thirty_days_ago)\
      .group_by(Transaction.category_id).all()
     
+    # Income and expenses for the last twelve months
+    today = date.today()
+    first_year, first_month = divmod(today.year * 12 + today.month - 12, 12)
+    monthly = rollups.monthly_totals(user_id, (first_year, first_month + 1),
+                                     (today.year, today.month))
+    
     # Goals progress
     goals_progress = []
-    for goal in Goal.query.filter_by(user_id=current_user.id, status=GoalStatus.ACTIVE).all():
+    for goal in Goal.query.filter_by(user_id=user_id, status=GoalStatus.ACTIVE).all():
         goals_progress.append({
             'title': goal.title,
             'progress': goal.progress_percentage,
             'days_remaining': goal.days_remaining()
         })
     
-    return jsonify({
+    return {
         'spending_by_category': [{'category_id': s.category_id, 'total': float(s.total)} for s in spending_data],
+        'monthly': [{
+            'month': f"{m['year']}-{m['month']:02d}",
+            'income': float(m['income']),
+            'expenses': float(m['expenses'])
+        } for m in monthly],
         'goals_progress': goals_progress
-    })
\ No newline at end of file
+    }
@@ -1,32 +1,41 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
-from app import db
-from app.models import Transaction, Category, TransactionType
-from app.forms import TransactionForm, CategoryForm
+from app import db, cache, ledger, importer, readpath, rollups, category_stats
+from app.models import User, Transaction, Category, TransactionType
+from app.forms import TransactionForm, CategoryForm, TransactionImportForm
+from app.pagination import keyset_paginate, InvalidCursor
 from datetime import datetime, date, timedelta
-from sqlalchemy import func, desc, extract
+from sqlalchemy import func, desc, select
+import click
 import csv
 import io
+import zlib
 
 transactions_bp = Blueprint('transactions', __name__)
 
+SUMMARY_MAX_YEARS = 20
+
 @transactions_bp.route('/')
 @login_required
 def list_transactions():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     type_filter = request.args.get('type', 'all')
     category_filter = request.args.get('category', 'all')
     
-    query = Transaction.query.filter_by(user_id=current_user.id)
+    query = readpath.transactions_select(current_user.id)
     
     if type_filter != 'all':
-        query = query.filter_by(type=TransactionType(type_filter))
+        query = query.where(Transaction.type == TransactionType(type_filter))
     
     if category_filter != 'all':
-        query = query.filter_by(category_id=category_filter)
+        query = query.where(Transaction.category_id == category_filter)
     
-    transactions = query.order_by(desc(Transaction.transaction_date))\
-                       .paginate(page=page, per_page=20, error_out=False)
+    try:
+        transactions = keyset_paginate(query, [Transaction.transaction_date, Transaction.id],
+                                       cursor=cursor, per_page=20)
+    except InvalidCursor:
+        return redirect(url_for('transactions.list_transactions', type=type_filter, category=category_filter))
+    transactions.items = readpath.transaction_records(transactions.items)
     
     categories = Category.query.filter_by(user_id=current_user.id).all()
     
@@ -65,6 +74,29 @@ def create_transaction():
     
     return render_template('transactions/create.html', form=form)
 
+@transactions_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_transactions():
+    form = TransactionImportForm()
+    result = None
+    
+    if form.validate_on_submit():
+        stream = io.TextIOWrapper(form.file.data.stream, encoding='utf-8-sig', newline='')
+        result = importer.import_transactions(current_user.id,
+                                              importer.read_csv(stream),
+                                              partial=form.partial.data,
+                                              create_categories=form.create_categories.data)
+        if result.imported:
+            flash(f'Imported {result.imported} transactions.', 'success')
+            if not result.errors:
+                return redirect(url_for('transactions.list_transactions'))
+        elif result.errors:
+            flash('Nothing was imported. Fix the errors below and upload the file again.', 'error')
+        else:
+            flash('The file did not contain any transactions.', 'info')
+    
+    return render_template('transactions/import.html', form=form, result=result)
+
 @transactions_bp.route('/<id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_transaction(id):
@@ -99,7 +131,8 @@ def delete_transaction(id):
 @login_required
 def list_categories():
     categories = Category.query.filter_by(user_id=current_user.id).all()
-    return render_template('transactions/categories.html', categories=categories)
+    stats = category_stats.category_totals(current_user.id, [category.id for category in categories])
+    return render_template('transactions/categories.html', categories=categories, stats=stats)
 
 @transactions_bp.route('/categories/create', methods=['GET', 'POST'])
 @login_required
@@ -146,59 +179,158 @@ def delete_category(id):
 @transactions_bp.route('/summary')
 @login_required
 def summary():
-    # Monthly summary for current year
-    current_year = datetime.now().year
-    monthly_data = db.session.query(
-        extract('month', Transaction.transaction_date).label('month'),
-        Transaction.type,
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        Transaction.user_id == current_user.id,
-        extract('year', Transaction.transaction_date) == current_year
-    ).group_by('month', Transaction.type).all()
+    # Monthly figures come from the rollup table, so the cost depends on the
+    # number of months shown rather than on the number of transactions.
+    current_year = date.today().year
+    start_year = request.args.get('start_year', current_year, type=int)
+    end_year = request.args.get('end_year', start_year, type=int)
+    if start_year > end_year:
+        start_year, end_year = end_year, start_year
+    if end_year - start_year >= SUMMARY_MAX_YEARS:
+        flash(f'Showing at most {SUMMARY_MAX_YEARS} years.', 'info')
+        start_year = end_year - SUMMARY_MAX_YEARS + 1
     
-    # Category breakdown for last 30 days
+    data = cache.cached('transaction-summary-page',
+                        lambda: _summary_data(current_user.id, start_year, end_year),
+                        current_user.id, depends_on=('transactions', 'categories'),
+                        args=(start_year, end_year))
+    
+    return render_template('transactions/summary.html',
+                         current_year=current_year,
+                         start_year=start_year,
+                         end_year=end_year,
+                         **data)
+
+def _summary_data(user_id, start_year, end_year):
+    income, expenses = ledger.get_totals(user_id)
+    monthly_data = [month for month in rollups.monthly_totals(user_id, (start_year, 1), (end_year, 12))
+                    if month['income'] or month['expenses']]
+    monthly_income, monthly_expenses = rollups.month_totals(user_id)
+    
+    # Category breakdown for last 30 days (an index range over those days only)
     thirty_days_ago = date.today() - timedelta(days=30)
     category_data = db.session.query(
         Category.name,
+        Category.icon,
         Category.color,
         func.sum(Transaction.amount).label('total')
     ).join(Transaction).filter(
-        Transaction.user_id == current_user.id,
+        Transaction.user_id == user_id,
         Transaction.type == TransactionType.EXPENSE,
         Transaction.transaction_date >= thirty_days_ago
     ).group_by(Category.id).all()
     
-    return render_template('transactions/summary.html',
-                         monthly_data=monthly_data,
-                         category_data=category_data,
-                         current_year=current_year)
+    return {
+        'current_balance': float(income - expenses),
+        'monthly_data': monthly_data,
+        'monthly_income': monthly_income,
+        'monthly_expenses': monthly_expenses,
+        'category_data': [row._asdict() for row in category_data]
+    }
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_HEADER = ['Date', 'Type', 'Amount', 'Category', 'Description']
+
+def _export_batches(user_id, start_date=None, end_date=None):
+    """Yield lists of CSV rows, fetched from the database in server-side batches."""
+    transactions = Transaction.__table__
+    categories = Category.__table__
+    query = select(
+        transactions.c.transaction_date,
+        transactions.c.type,
+        transactions.c.amount,
+        categories.c.name,
+        transactions.c.description
+    ).join_from(transactions, categories, transactions.c.category_id == categories.c.id)\
+     .where(transactions.c.user_id == user_id)
+    
+    if start_date:
+        query = query.where(Transaction.transaction_date >= start_date)
+    if end_date:
+        query = query.where(Transaction.transaction_date <= end_date)
+    
+    query = query.order_by(desc(Transaction.transaction_date), desc(Transaction.id))
+    
+    for partition in readpath.stream(query, EXPORT_BATCH_SIZE):
+        yield [[
+            transaction_date.strftime('%Y-%m-%d'),
+            transaction_type.value,
+            float(amount),
+            category_name,
+            description or ''
+        ] for transaction_date, transaction_type, amount, category_name, description in partition]
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    yield buffer.getvalue()
+    
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
 
 @transactions_bp.route('/export')
 @login_required
 def export_transactions():
-    transactions = Transaction.query.filter_by(user_id=current_user.id)\
-                                  .order_by(desc(Transaction.transaction_date)).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['Date', 'Type', 'Amount', 'Category', 'Description'])
-    
-    # Write data
-    for transaction in transactions:
-        writer.writerow([
-            transaction.transaction_date.strftime('%Y-%m-%d'),
-            transaction.type.value,
-            float(transaction.amount),
-            transaction.category.name,
-            transaction.description or ''
-        ])
-    
-    # Create response
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename=transactions_{date.today().strftime("%Y%m%d")}.csv'
-    
-    return response
\ No newline at end of file
+    try:
+        start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        flash('Invalid export date range. Use YYYY-MM-DD.', 'error')
+        return redirect(url_for('transactions.summary'))
+    
+    use_gzip = request.args.get('gzip', 'false').lower() == 'true'
+    
+    # Rows are written as they are read, so memory stays flat regardless of
+    # how many transactions the user has.
+    chunks = _csv_chunks(_export_batches(current_user.id, start_date, end_date))
+    filename = f'transactions_{date.today().strftime("%Y%m%d")}.csv'
+    
+    if use_gzip:
+        response = Response(stream_with_context(_gzip_chunks(chunks)), mimetype='application/gzip')
+        filename += '.gz'
+    else:
+        response = Response(stream_with_context(chunks), mimetype='text/csv')
+    
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@transactions_bp.cli.command('reconcile-balances')
+@click.option('--dry-run', is_flag=True, help='Report drift without rewriting stored balances.')
+def reconcile_balances(dry_run):
+    """Rebuild per-user balances from the transactions table and report drift."""
+    drift = ledger.reconcile(fix=not dry_run)
+    
+    for user_id, stored, (income, expense) in drift:
+        if stored is None:
+            click.echo(f'{user_id}: missing -> income {income}, expenses {expense}')
+        else:
+            click.echo(f'{user_id}: income {stored[0]} -> {income}, expenses {stored[1]} -> {expense}')
+    
+    action = 'found' if dry_run else 'fixed'
+    click.echo(f'{len(drift)} balance(s) with drift {action}.')
+
+@transactions_bp.cli.command('rebuild-rollups')
+@click.option('--user', 'username', help='Only rebuild this user\'s rollups.')
+def rebuild_rollups(username):
+    """Recompute the monthly transaction rollups from the transactions table."""
+    user_id = None
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.UsageError(f'No user named {username}.')
+        user_id = user.id
+    
+    count = rollups.rebuild(user_id)
+    click.echo(f'{count} rollup row(s) written.')
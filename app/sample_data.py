@@ -136,8 +136,6 @@ def create_sample_goals(user):
             if milestone_data['completed']:
                 milestone.completed_at = datetime.utcnow()
             db.session.add(milestone)
-        
-        goal.update_progress()
 
 def create_sample_transactions(user):
     # Get user categories
@@ -0,0 +1,176 @@
+"""Schema upgrades for existing databases and query-plan checks.
+
+``db.create_all()`` only creates missing tables; it never adds indexes or
+columns to tables that already exist. ``upgrade_schema`` brings an existing
+database in line with the models by additionally creating missing indexes,
+dropping the ones listed in ``RETIRED_INDEXES`` and adding missing columns
+(``ALTER TABLE ... ADD COLUMN``). It is idempotent and
+runs on startup from ``run.py``, or explicitly with ``flask schema upgrade``.
+
+``flask schema check-plans`` replays the statements issued by the hottest
+routes through ``EXPLAIN QUERY PLAN`` (SQLite) and fails if any of them falls
+back to a full table scan.
+"""
+import sys
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import MetaData, Table, event, func, inspect, literal, select, text
+from app import db
+
+schema_cli = AppGroup('schema', help='Database schema maintenance.')
+
+# Indexes that models no longer define, by table; replaced by the index in the comment
+RETIRED_INDEXES = {
+    'sync_changes': ('ix_sync_changes_seq',),  # uq_sync_changes_seq
+}
+
+# Routes whose statements must all be served by an index
+PLAN_CHECK_URLS = ['/dashboard', '/transactions/summary', '/api/transactions', '/api/sync?since=0']
+
+def _default_literal(column, dialect):
+    if column.default is None or not column.default.is_scalar or column.default.arg is None:
+        return None
+    default = column.default.arg
+    return str(literal(default, column.type).compile(dialect=dialect,
+                                                     compile_kwargs={'literal_binds': True}))
+
+def _add_column(connection, table, column):
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    ddl = (f'ALTER TABLE {preparer.format_table(table)} '
+           f'ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=dialect)}')
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+    else:
+        default = _default_literal(column, dialect)
+        if default is not None:
+            ddl += f' DEFAULT {default}'
+            if not column.nullable:
+                ddl += ' NOT NULL'
+    connection.execute(text(ddl))
+
+def upgrade_schema(echo=None):
+    """Create missing tables, columns and indexes. Returns a list of changes."""
+    changes = []
+    engine = db.engine
+    existing_tables = set(inspect(engine).get_table_names())
+    db.create_all()
+
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in db.metadata.sorted_tables:
+            existing_columns = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    _add_column(connection, table, column)
+                    changes.append(f'added column {table.name}.{column.name}')
+
+            existing_indexes = {i['name'] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    changes.append(f'created index {index.name}')
+            for name in RETIRED_INDEXES.get(table.name, ()):
+                if name in existing_indexes:
+                    reflected = Table(table.name, MetaData(), autoload_with=connection)
+                    next(index for index in reflected.indexes if index.name == name).drop(connection)
+                    changes.append(f'dropped index {name}')
+
+        # The sync journal numbers changes from its counter row; start after the journal
+        from app.models import SyncChange, SyncCounter
+        if connection.execute(select(SyncCounter.id)).first() is None:
+            last_seq = connection.execute(select(func.max(SyncChange.seq))).scalar() or 0
+            connection.execute(SyncCounter.__table__.insert().values(id=1, last_seq=last_seq))
+            changes.append(f'seeded sync_counter at {last_seq}')
+
+    # Derived tables added to a database that already has data start out empty
+    if existing_tables and 'transaction_rollups' not in existing_tables:
+        from app import rollups
+        rollups.rebuild()
+        changes.append('backfilled transaction_rollups')
+    if 'added column goals.milestone_total' in changes:
+        from app import goal_progress
+        goal_progress.rebuild()
+        changes.append('backfilled goal milestone counters')
+
+    if echo:
+        for change in changes:
+            echo(change)
+    return changes
+
+def _full_scans(plan_rows):
+    """Plan details that read a whole table rather than an index range."""
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        if detail.startswith('SCAN ') and 'CONSTANT ROW' not in detail and 'SUBQUERY' not in detail:
+            scans.append(detail)
+    return scans
+
+def check_query_plans(user, urls=None):
+    """Run ``urls`` as ``user`` and return ``[(url, sql, [full scans])]`` offenders."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            captured.append((statement, parameters))
+
+    client = current_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user.id
+        session['_fresh'] = True
+
+    offenders = []
+    engine = db.engine
+    for url in urls or PLAN_CHECK_URLS:
+        captured.clear()
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            response = client.get(url)
+            response.get_data()
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+        if response.status_code != 200:
+            offenders.append((url, f'HTTP {response.status_code}', []))
+            continue
+
+        with engine.connect() as connection:
+            for statement, parameters in captured:
+                plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                scans = _full_scans(plan)
+                if scans:
+                    offenders.append((url, statement, scans))
+    return offenders
+
+@schema_cli.command('upgrade')
+def upgrade_command():
+    """Create missing tables, columns and indexes."""
+    changes = upgrade_schema(echo=click.echo)
+    click.echo(f'{len(changes)} change(s) applied.')
+
+@schema_cli.command('check-plans')
+@click.option('--user', 'username', help='Account to run the routes as (default: the one with most transactions).')
+def check_plans_command(username):
+    """Fail if a hot route's query plan contains a full table scan."""
+    from app.models import User, Transaction
+
+    if db.engine.dialect.name != 'sqlite':
+        raise click.UsageError('check-plans uses EXPLAIN QUERY PLAN and only supports SQLite.')
+
+    if username:
+        user = User.query.filter_by(username=username).first()
+    else:
+        user = User.query.join(Transaction).group_by(User.id)\
+                   .order_by(db.func.count(Transaction.id).desc()).first() or User.query.first()
+    if user is None:
+        raise click.UsageError('No users in the database.')
+
+    offenders = check_query_plans(user)
+    for url, statement, scans in offenders:
+        click.echo(f'{url}: {"; ".join(scans) or statement}')
+        click.echo('    ' + ' '.join(statement.split()))
+    if offenders:
+        click.echo(f'{len(offenders)} statement(s) fall back to a full table scan.')
+        sys.exit(1)
+    click.echo('All checked statements use an index.')
@@ -0,0 +1,283 @@
+"""Compiled row serializers and sparse fieldsets for the JSON API.
+
+A ``Serializer`` declares the fields a model exposes. ``select(names)`` turns
+a set of field names (by default the ones the endpoints always returned)
+into a ``Selection``: the columns to query, the joins they need, and a
+row-to-dict function generated once per distinct field set. The statement
+selects plain table columns and is meant to run through ``app.readpath``, so
+rows never become ORM instances. The row-to-dict function
+indexes the result tuples directly and inlines ``isoformat()`` / ``.value``
+/ ``float()``, so serializing a row is a single dict display.
+
+Derived fields come in two kinds:
+
+* per-row, computed from other columns of the same row (``days_remaining``);
+* batched, filled from a *loader* that runs once per response for all rows
+  (completion rates, per-category totals). A loader only runs when one of
+  its fields is selected.
+
+Clients pick fields with ``?fields=id,name,completion_rate``; unknown names
+raise ``UnknownFields``.
+
+    selection = serializers.goals.select(serializers.goals.parse(request.args.get('fields')))
+    rows = readpath.fetch_all(selection.statement().where(Goal.user_id == user_id))
+    return jsonify(selection.dump(rows))
+"""
+from datetime import date
+from sqlalchemy import select
+from app import category_stats, habit_stats
+from app.models import Goal, Milestone, Transaction, Category, Habit, HabitLog
+
+class UnknownFields(ValueError):
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f'Unknown field(s): {", ".join(names)}')
+
+# Inline encoders: ``{0}`` is replaced with the value expression
+ISO = '{0}.isoformat()'
+VALUE = '{0}.value'
+FLOAT = 'float({0})'
+TIME = "{0}.strftime('%H:%M')"
+
+class Field:
+    """One output key.
+
+    ``column``   a model column, optionally with an inline ``encode`` template
+    ``nested``   ``{key: column}`` rendered as a nested object (needs ``join``)
+    ``compute``  ``compute(*values of needs)`` for per-row derived fields
+    ``loader``   name of a batch loader; ``compute(loaded value for the row)``
+    ``default``  included when the client does not ask for specific fields
+    """
+
+    def __init__(self, name, column=None, encode=None, nested=None, join=None,
+                 compute=None, needs=(), loader=None, default=True):
+        self.name = name
+        self.column = column
+        self.encode = encode
+        self.nested = nested
+        self.join = join
+        self.compute = compute
+        self.needs = tuple(needs)
+        self.loader = loader
+        self.default = default
+
+    def columns(self):
+        if self.column is not None:
+            return (self.column,)
+        if self.nested is not None:
+            return tuple(self.nested.values())
+        return self.needs
+
+class Loader:
+    def __init__(self, function, needs):
+        self.function = function
+        self.needs = tuple(needs)
+
+def _value(column, index, encode):
+    source = f'row[{index}]'
+    if encode is None:
+        return source
+    expression = encode.format(source)
+    if column.nullable:
+        expression = f'({expression} if {source} is not None else None)'
+    return expression
+
+class Selection:
+    def __init__(self, serializer, names, extra=()):
+        self.serializer = serializer
+        self.names = names
+        self.fields = [serializer.fields[name] for name in names]
+        self.loaders = {}
+        for field in self.fields:
+            if field.loader is not None:
+                self.loaders[field.loader] = serializer.loaders[field.loader]
+
+        columns = [serializer.key]
+        for field in self.fields:
+            columns.extend(field.columns())
+        for loader in self.loaders.values():
+            columns.extend(loader.needs)
+        columns.extend(extra)
+        self.columns = []
+        self.joins = []
+        for column in columns:
+            if not any(column is seen for seen in self.columns):
+                self.columns.append(column)
+        for field in self.fields:
+            if field.join is not None and field.join not in self.joins:
+                self.joins.append(field.join)
+        self.serialize = self._compile()
+
+    def _index(self, column):
+        return next(i for i, seen in enumerate(self.columns) if seen is column)
+
+    def _compile(self):
+        namespace = {}
+        items = []
+        for i, field in enumerate(self.fields):
+            if field.column is not None:
+                expression = _value(field.column, self._index(field.column), field.encode)
+            elif field.nested is not None:
+                expression = '{' + ', '.join(f'{key!r}: row[{self._index(column)}]'
+                                             for key, column in field.nested.items()) + '}'
+            elif field.loader is not None:
+                namespace[f'_compute{i}'] = field.compute
+                expression = f'_compute{i}(loaded[{field.loader!r}][row[0]])'
+            else:
+                namespace[f'_compute{i}'] = field.compute
+                arguments = ', '.join(f'row[{self._index(column)}]' for column in field.needs)
+                expression = f'_compute{i}({arguments})'
+            items.append(f'{field.name!r}: {expression}')
+
+        source = 'def serialize(row, loaded):\n    return {' + ', '.join(items) + '}\n'
+        exec(compile(source, f'<serializer {self.serializer.name}>', 'exec'), namespace)
+        return namespace['serialize']
+
+    def statement(self):
+        """Core ``select()`` of the selected table columns, with their joins applied.
+
+        Run it with ``app.readpath`` so rows skip the ORM entirely.
+        """
+        table = self.serializer.model.__table__
+        # Columns of joined tables are labelled so row attributes stay unambiguous
+        entities = [column.expression if column.table is table
+                    else column.expression.label(f'{column.table.name}__{column.key}')
+                    for column in self.columns]
+        statement = select(*entities).select_from(table)
+        for join in self.joins:
+            statement = statement.join(join.__table__)
+        return statement
+
+    def dump(self, rows, **params):
+        """Serialize ``rows`` (results of ``statement()``); ``params`` go to the loaders."""
+        loaded = {name: loader.function(rows, **params) for name, loader in self.loaders.items()}
+        serialize = self.serialize
+        return [serialize(row, loaded) for row in rows]
+
+class Serializer:
+    def __init__(self, model, fields, key=None):
+        self.model = model
+        self.name = model.__name__
+        self.key = key if key is not None else model.id
+        self.fields = {field.name: field for field in fields}
+        self.defaults = tuple(field.name for field in fields if field.default)
+        self.loaders = {}
+        self._selections = {}
+
+    def loader(self, name, needs=()):
+        """Register ``function(rows, **params) -> {key: value}`` as a batch loader."""
+        def register(function):
+            self.loaders[name] = Loader(function, needs)
+            return function
+        return register
+
+    def parse(self, value):
+        """Field names from a ``fields`` query parameter; ``None`` means the defaults."""
+        if value is None or not value.strip():
+            return self.defaults
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise UnknownFields(unknown)
+        # Output keys follow the declaration order, whatever order was asked for
+        wanted = set(names)
+        return tuple(name for name in self.fields if name in wanted)
+
+    def select(self, names=None, extra=()):
+        """``Selection`` for ``names``; ``extra`` columns are queried but not output."""
+        names = tuple(names) if names is not None else self.defaults
+        key = (names, tuple(extra))
+        selection = self._selections.get(key)
+        if selection is None:
+            selection = self._selections[key] = Selection(self, names, extra)
+        return selection
+
+
+def _days_remaining(target_date):
+    return (target_date - date.today()).days if target_date else None
+
+goals = Serializer(Goal, [
+    Field('id', Goal.id),
+    Field('title', Goal.title),
+    Field('description', Goal.description),
+    Field('target_date', Goal.target_date, ISO),
+    Field('status', Goal.status, VALUE),
+    Field('progress_percentage', Goal.progress_percentage),
+    Field('milestone_total', Goal.milestone_total),
+    Field('milestone_completed', Goal.milestone_completed),
+    Field('created_at', Goal.created_at, ISO),
+    Field('updated_at', Goal.updated_at, ISO, default=False),
+    Field('days_remaining', compute=_days_remaining, needs=(Goal.target_date,)),
+])
+
+milestones = Serializer(Milestone, [
+    Field('id', Milestone.id),
+    Field('goal_id', Milestone.goal_id),
+    Field('title', Milestone.title),
+    Field('description', Milestone.description),
+    Field('target_date', Milestone.target_date, ISO),
+    Field('is_completed', Milestone.is_completed),
+    Field('completed_at', Milestone.completed_at, ISO),
+    Field('created_at', Milestone.created_at, ISO),
+])
+
+transactions = Serializer(Transaction, [
+    Field('id', Transaction.id),
+    Field('amount', Transaction.amount, FLOAT),
+    Field('type', Transaction.type, VALUE),
+    Field('category_id', Transaction.category_id, default=False),
+    Field('category', nested={'id': Category.id, 'name': Category.name,
+                              'color': Category.color, 'icon': Category.icon},
+          join=Category),
+    Field('description', Transaction.description),
+    Field('transaction_date', Transaction.transaction_date, ISO),
+    Field('receipt_url', Transaction.receipt_url, default=False),
+    Field('created_at', Transaction.created_at, ISO),
+])
+
+categories = Serializer(Category, [
+    Field('id', Category.id),
+    Field('name', Category.name),
+    Field('color', Category.color),
+    Field('icon', Category.icon),
+    Field('is_default', Category.is_default),
+    Field('transaction_count', loader='totals', compute=lambda totals: totals['count'], default=False),
+    Field('income', loader='totals', compute=lambda totals: float(totals['income']), default=False),
+    Field('expenses', loader='totals', compute=lambda totals: float(totals['expenses']), default=False),
+])
+
+@categories.loader('totals')
+def _category_totals(rows, user_id, **params):
+    return category_stats.category_totals(user_id, [row[0] for row in rows])
+
+habits = Serializer(Habit, [
+    Field('id', Habit.id),
+    Field('name', Habit.name),
+    Field('description', Habit.description),
+    Field('frequency', Habit.frequency, VALUE),
+    Field('target_count', Habit.target_count),
+    Field('current_streak', loader='summary', compute=lambda summary: summary['current_streak']),
+    Field('longest_streak', Habit.longest_streak),
+    Field('is_active', Habit.is_active),
+    Field('reminder_time', Habit.reminder_time, TIME),
+    Field('completed_today', loader='summary', compute=lambda summary: summary['completed_today']),
+    Field('completion_rate', loader='summary', compute=lambda summary: summary['completion_rates'][30]),
+    Field('completion_rates', loader='summary',
+          compute=lambda summary: {str(days): rate for days, rate in summary['requested_rates'].items()}),
+    Field('created_at', Habit.created_at, ISO),
+])
+
+@habits.loader('summary', needs=(Habit.frequency, Habit.current_streak, Habit.completion_rate, Habit.stats_date))
+def _habit_summaries(rows, windows=(7, 30, 90), **params):
+    summaries = habit_stats.habit_summaries(rows, windows=list(windows) + [30])
+    for summary in summaries.values():
+        summary['requested_rates'] = {days: summary['completion_rates'][days] for days in windows}
+    return summaries
+
+habit_logs = Serializer(HabitLog, [
+    Field('id', HabitLog.id),
+    Field('habit_id', HabitLog.habit_id),
+    Field('date_completed', HabitLog.date_completed, ISO),
+    Field('notes', HabitLog.notes),
+    Field('created_at', HabitLog.created_at, ISO),
+])
@@ -0,0 +1,76 @@
+"""Streak computation over a habit's completion dates.
+
+A streak is a run of consecutive periods (days, Monday-based weeks or
+calendar months, depending on the habit's frequency) with at least one
+check-in. The current streak is the run ending in the current period, so it
+is 0 until the habit has been done in the period containing ``today``.
+"""
+from datetime import date
+from app import db
+from app.models import HabitLog, HabitFrequency
+
+def period_index(day, frequency):
+    """Map a date to an integer so that consecutive periods differ by one."""
+    if frequency == HabitFrequency.WEEKLY:
+        return (day.toordinal() - day.weekday()) // 7
+    if frequency == HabitFrequency.MONTHLY:
+        return day.year * 12 + day.month - 1
+    return day.toordinal()
+
+def compute_streaks(dates, frequency, today=None):
+    """Return ``(current_streak, longest_streak)`` for the given completion dates."""
+    if today is None:
+        today = date.today()
+
+    periods = {period_index(d, frequency) for d in dates if d <= today}
+    if not periods:
+        return 0, 0
+
+    longest = 0
+    for period in periods:
+        if period - 1 in periods:
+            continue
+        length = 1
+        while period + length in periods:
+            length += 1
+        longest = max(longest, length)
+
+    current = 0
+    period = period_index(today, frequency)
+    while period in periods:
+        current += 1
+        period -= 1
+
+    return current, longest
+
+def fetch_log_dates(habit_id, today=None):
+    """All completion dates up to ``today`` for one habit, in a single query."""
+    if today is None:
+        today = date.today()
+    rows = db.session.query(HabitLog.date_completed).filter(
+        HabitLog.habit_id == habit_id,
+        HabitLog.date_completed <= today
+    )
+    return [d for (d,) in rows]
+
+def refresh_streak(habit, today=None):
+    current, longest = compute_streaks(fetch_log_dates(habit.id, today), habit.frequency, today)
+    habit.current_streak = current
+    habit.longest_streak = longest
+    return current, longest
+
+def refresh_streaks(habits, today=None):
+    """Recompute the streaks of several habits from one query for all their logs."""
+    if today is None:
+        today = date.today()
+    habits = list(habits)
+    dates = {habit.id: [] for habit in habits}
+    if habits:
+        rows = db.session.query(HabitLog.habit_id, HabitLog.date_completed).filter(
+            HabitLog.habit_id.in_(list(dates)),
+            HabitLog.date_completed <= today
+        )
+        for habit_id, day in rows:
+            dates[habit_id].append(day)
+    for habit in habits:
+        habit.current_streak, habit.longest_streak = compute_streaks(dates[habit.id], habit.frequency, today)
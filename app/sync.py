@@ -0,0 +1,248 @@
+"""Change journal and delta sync for offline clients.
+
+Every flush that inserts, updates or deletes a synced row (goals, milestones,
+habits, habit logs, categories, transactions) upserts one ``sync_changes`` row
+per entity with a new, database-wide change sequence number. Deleted rows keep
+their entry as a tombstone. ``changes_since(user_id, token)`` reads the user's
+entries after ``token`` through ``ix_sync_changes_user_seq`` and loads only
+those rows, so a sync costs what changed, not what the account holds.
+
+Sequence numbers come from the single ``sync_counter`` row. Taking them
+updates that row, which locks it (on SQLite, the whole database) until the
+transaction ends, so transactions that journal changes commit one after
+another in sequence order and a token can never skip a change that commits
+later with a lower number. A unique index on ``seq`` backs this up. Tokens
+are the counter's committed value. Milestone writes also record their goal,
+whose counters move with them (see ``app/goal_progress.py``). Core writes that
+bypass the flush (CSV imports, batch check-ins) call ``record()`` themselves.
+
+    GET /api/sync                -> full state and a token
+    GET /api/sync?since=<token>  -> inserted / updated / deleted since then
+"""
+from sqlalchemy import event, func, inspect, select
+from app import db, readpath, serializers
+from app.database import supports_upsert, upsert_insert
+from app.models import User, Goal, Milestone, Transaction, Category, Habit, HabitLog, SyncChange, SyncCounter
+
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+INSERTED, UPDATED, DELETED = 'inserted', 'updated', 'deleted'
+
+ENTITIES = {Goal: 'goals', Milestone: 'milestones', Habit: 'habits',
+            HabitLog: 'habit_logs', Category: 'categories', Transaction: 'transactions'}
+# Rows without a user_id belong to their parent's owner
+PARENTS = {Milestone: (Goal, 'goal_id'), HabitLog: (Habit, 'habit_id')}
+
+# Fields sent for each entity; stored columns only, plus the habit's live streak
+FIELDS = {
+    'goals': (serializers.goals, ('id', 'title', 'description', 'target_date', 'status',
+                                  'progress_percentage', 'milestone_total', 'milestone_completed',
+                                  'created_at', 'updated_at')),
+    'milestones': (serializers.milestones, None),
+    'habits': (serializers.habits, ('id', 'name', 'description', 'frequency', 'target_count',
+                                    'current_streak', 'longest_streak', 'is_active',
+                                    'reminder_time', 'created_at')),
+    'habit_logs': (serializers.habit_logs, None),
+    'categories': (serializers.categories, None),
+    'transactions': (serializers.transactions, ('id', 'amount', 'type', 'category_id', 'description',
+                                                'transaction_date', 'receipt_url', 'created_at')),
+}
+
+class InvalidToken(ValueError):
+    pass
+
+def parse_token(value):
+    try:
+        seq = int(value)
+    except (TypeError, ValueError):
+        raise InvalidToken('Invalid sync token') from None
+    if seq < 0:
+        raise InvalidToken('Invalid sync token')
+    return seq
+
+def current_seq(connection=None):
+    """The last sequence number handed out; every change up to it has committed."""
+    table = SyncCounter.__table__
+    connection = connection if connection is not None else db.session.connection()
+    return connection.execute(select(table.c.last_seq).where(table.c.id == 1)).scalar() or 0
+
+def _allocate(connection, count):
+    """Reserve ``count`` sequence numbers and return the first."""
+    table = SyncCounter.__table__
+    # Locks the counter row until this transaction commits or rolls back
+    result = connection.execute(table.update().where(table.c.id == 1)
+                                .values(last_seq=table.c.last_seq + count))
+    if result.rowcount == 0:
+        # Database created without upgrade_schema: start after the journal
+        changes = SyncChange.__table__
+        last_seq = connection.execute(select(func.max(changes.c.seq))).scalar() or 0
+        connection.execute(table.insert().values(id=1, last_seq=last_seq + count))
+    return current_seq(connection) - count + 1
+
+def record(connection, user_id, entity, ids, change=UPDATED):
+    """Journal a write the flush hook cannot see (e.g. Core bulk inserts)."""
+    _write(connection, {(entity, entity_id): (user_id, change) for entity_id in ids})
+
+def _write(connection, changes):
+    """Upsert ``{(entity, entity_id): (user_id, change)}`` with fresh sequence numbers."""
+    if not changes:
+        return
+    first = _allocate(connection, len(changes))
+    rows = [{
+        'entity': entity,
+        'entity_id': entity_id,
+        'user_id': user_id,
+        'seq': first + i,
+        # Rows that predate the journal count as created before any token
+        'created_seq': first + i if change == INSERTED else 0,
+        'deleted': change == DELETED
+    } for i, ((entity, entity_id), (user_id, change)) in enumerate(changes.items())]
+
+    table = SyncChange.__table__
+    if not supports_upsert(connection):
+        # No ON CONFLICT (MySQL): update the journalled rows, insert the rest
+        for row in rows:
+            result = connection.execute(
+                table.update()
+                .where(table.c.entity == row['entity'], table.c.entity_id == row['entity_id'])
+                .values(seq=row['seq'], deleted=row['deleted'])
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(**row))
+        return
+
+    statement = upsert_insert(table, connection)
+    statement = statement.on_conflict_do_update(
+        index_elements=['entity', 'entity_id'],
+        set_={'seq': statement.excluded.seq, 'deleted': statement.excluded.deleted}
+    )
+    connection.execute(statement, rows)
+
+def _loaded(obj, key):
+    # Read without triggering a refresh: deleted rows can no longer be loaded
+    return inspect(obj).dict.get(key)
+
+def _owners(session, model, ids):
+    owners = {}
+    mapper = inspect(model)
+    for parent_id in ids:
+        parent = session.identity_map.get(mapper.identity_key_from_primary_key((parent_id,)))
+        if parent is not None and _loaded(parent, 'user_id') is not None:
+            owners[parent_id] = _loaded(parent, 'user_id')
+    missing = [parent_id for parent_id in ids if parent_id not in owners]
+    if missing:
+        rows = session.connection().execute(select(model.id, model.user_id).where(model.id.in_(missing)))
+        owners.update(rows.all())
+    return owners
+
+def _touched(session):
+    for obj in session.new:
+        yield obj, INSERTED
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            yield obj, UPDATED
+    for obj in session.deleted:
+        yield obj, DELETED
+
+@event.listens_for(db.session, 'after_flush')
+def _journal_changes(session, flush_context):
+    changes = {}
+    children = []
+    deleted_users = []
+    for obj, change in _touched(session):
+        model = type(obj)
+        if model is User and change == DELETED:
+            deleted_users.append(obj.id)
+        elif model in PARENTS:
+            children.append((obj, change))
+        elif model in ENTITIES:
+            changes[(ENTITIES[model], obj.id)] = (obj.user_id, change)
+
+    for model, (parent, key) in PARENTS.items():
+        parent_ids = {_loaded(obj, key) for obj, _ in children if type(obj) is model}
+        owners = _owners(session, parent, parent_ids) if parent_ids else {}
+        for obj, change in children:
+            if type(obj) is model and _loaded(obj, key) in owners:
+                user_id = owners[_loaded(obj, key)]
+                changes[(ENTITIES[model], obj.id)] = (user_id, change)
+                if model is Milestone:
+                    changes.setdefault(('goals', _loaded(obj, key)), (user_id, UPDATED))
+
+    connection = session.connection()
+    changes = {key: value for key, value in changes.items() if value[0] not in deleted_users}
+    _write(connection, changes)
+    if deleted_users:
+        table = SyncChange.__table__
+        connection.execute(table.delete().where(table.c.user_id.in_(deleted_users)))
+
+def _selection(entity):
+    serializer, names = FIELDS[entity]
+    return serializer.select(names)
+
+def _owned(entity, statement, user_id):
+    model = _selection(entity).serializer.model
+    if model in PARENTS:
+        parent = PARENTS[model][0]
+        return statement.join(parent.__table__).where(parent.user_id == user_id)
+    return statement.where(model.user_id == user_id)
+
+def _empty():
+    return {entity: {INSERTED: [], UPDATED: [], DELETED: []} for entity in FIELDS}
+
+def snapshot(user_id):
+    """Every synced row of a user, as ``inserted``, with the token to sync from next."""
+    # Taken first: anything written while the snapshot is read is sent again next time
+    token = current_seq()
+    changes = _empty()
+    for entity in FIELDS:
+        selection = _selection(entity)
+        model = selection.serializer.model
+        rows = readpath.fetch_all(_owned(entity, selection.statement(), user_id).order_by(model.created_at))
+        changes[entity][INSERTED] = selection.dump(rows)
+    return {'token': str(token), 'has_more': False, 'changes': changes}
+
+def changes_since(user_id, since, limit=PAGE_SIZE):
+    """Rows of a user inserted, updated or deleted after sequence ``since``.
+
+    At most ``limit`` changes are returned, oldest first; ``has_more`` asks the
+    client to call again with the returned token.
+    """
+    table = SyncChange.__table__
+    entries = readpath.fetch_all(
+        select(table.c.entity, table.c.entity_id, table.c.seq, table.c.created_seq, table.c.deleted)
+        .where(table.c.user_id == user_id, table.c.seq > since)
+        .order_by(table.c.seq)
+        .limit(limit + 1)
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changes = _empty()
+    wanted = {}
+    for entity, entity_id, seq, created_seq, deleted in entries:
+        created = created_seq > since
+        if deleted:
+            # Created and deleted since the token: the client never saw it
+            if not created:
+                changes[entity][DELETED].append(entity_id)
+        else:
+            wanted.setdefault(entity, {})[entity_id] = INSERTED if created else UPDATED
+
+    for entity, kinds in wanted.items():
+        selection = _selection(entity)
+        model = selection.serializer.model
+        ids = list(kinds)
+        items = {}
+        for start in range(0, len(ids), 500):
+            rows = readpath.fetch_all(selection.statement().where(model.id.in_(ids[start:start + 500])))
+            items.update((item['id'], item) for item in selection.dump(rows))
+        for entity_id, kind in kinds.items():
+            if entity_id in items:
+                changes[entity][kind].append(items[entity_id])
+            elif kind == UPDATED:
+                # Deleted after the journal was read
+                changes[entity][DELETED].append(entity_id)
+
+    token = entries[-1].seq if entries else since
+    return {'token': str(token), 'has_more': has_more, 'changes': changes}
@@ -0,0 +1,49 @@
+"""Diff two benchmark result files written by ``benchmarks.run``.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+import sys
+
+METRICS = ['p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'peak_memory_kb']
+
+def _change(before, after):
+    if before is None or after is None:
+        return ''
+    if before == 0:
+        return '' if after == 0 else 'new'
+    return f'{(after - before) / before * 100:+.1f}%'
+
+def compare(before, after):
+    rows = []
+    for name in sorted(set(before['results']) | set(after['results'])):
+        old = before['results'].get(name, {})
+        new = after['results'].get(name, {})
+        for metric in METRICS:
+            rows.append((name, metric, old.get(metric), new.get(metric), _change(old.get(metric), new.get(metric))))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    if before['meta'].get('sizes') != after['meta'].get('sizes'):
+        print(f"warning: dataset sizes differ ({before['meta'].get('sizes')} vs {after['meta'].get('sizes')})")
+
+    print(f"{'scenario':<28}{'metric':<22}{'before':>12}{'after':>12}{'change':>10}")
+    for name, metric, old, new, change in compare(before, after):
+        old = '-' if old is None else old
+        new = '-' if new is None else new
+        print(f'{name:<28}{metric:<22}{old:>12}{new:>12}{change:>10}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Throughput under concurrent writers and readers.
+
+    python -m benchmarks.concurrency --scale small --writers 4 --readers 8 --profile default
+    python -m benchmarks.concurrency --scale small --writers 4 --readers 8 --profile production
+
+Writer threads create income transactions through ``POST /api/transactions``
+while reader threads alternate between ``GET /api/transactions`` and
+``GET /api/habits``, each thread logged in as its own benchmark user. After
+``--duration`` seconds the report lists requests per second, latency
+percentiles and status codes per role; ``503`` responses and ``500`` errors
+are where SQLite gave up with "database is locked". The transactions created
+during the run are deleted again afterwards.
+"""
+import argparse
+from datetime import datetime
+import json
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from benchmarks.run import _build_app, _percentiles, _prepare_database
+
+READ_PATHS = ['/api/transactions?per_page=20', '/api/habits']
+
+class _Worker(threading.Thread):
+    def __init__(self, role, app, email, category_id, deadline, ready, seed):
+        super().__init__(name=f'{role}-{seed}')
+        self.role = role
+        self.app = app
+        self.email = email
+        self.category_id = category_id
+        self.deadline = deadline
+        self.ready = ready
+        self.rng = random.Random(seed)
+        self.latencies = []
+        self.statuses = {}
+        self.created = []
+
+    def _request(self, client):
+        if self.role == 'writer':
+            return client.post('/api/transactions', json={
+                'amount': '1.00',
+                'type': 'Income',
+                'category_id': self.category_id,
+                'description': 'concurrency benchmark'
+            })
+        return client.get(self.rng.choice(READ_PATHS))
+
+    def run(self):
+        from benchmarks.seed import BENCH_PASSWORD
+        client = self.app.test_client()
+        response = client.post('/auth/login', data={'email': self.email, 'password': BENCH_PASSWORD})
+        if response.status_code != 302:
+            raise RuntimeError(f'Login failed for {self.email}: {response.status_code}')
+
+        self.ready.wait()
+        while time.perf_counter() < self.deadline[0]:
+            started = time.perf_counter()
+            response = self._request(client)
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            status = str(response.status_code)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if self.role == 'writer' and response.status_code == 201:
+                self.created.append(response.get_json()['id'])
+
+def _accounts(app, count, rng):
+    """``count`` (email, category id) pairs, for distinct benchmark users where possible."""
+    from app.models import User, Category
+    with app.app_context():
+        rows = User.query.with_entities(User.id, User.email)\
+                         .filter(User.username.like('bench_user_%')).limit(max(count * 4, 100)).all()
+        chosen = rng.sample(rows, min(count, len(rows)))
+        categories = dict(Category.query.with_entities(Category.user_id, Category.id)
+                          .filter(Category.user_id.in_([user_id for user_id, _ in chosen])))
+    accounts = [(email, categories[user_id]) for user_id, email in chosen]
+    return [accounts[i % len(accounts)] for i in range(count)]
+
+def _summarize(workers, duration):
+    latencies = [value for worker in workers for value in worker.latencies]
+    statuses = {}
+    for worker in workers:
+        for status, count in worker.statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    if not latencies:
+        return {'threads': len(workers), 'requests': 0, 'status_codes': statuses}
+    p50, p95, p99 = _percentiles(latencies)
+    return {
+        'threads': len(workers),
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'max_ms': round(max(latencies), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'status_codes': statuses
+    }
+
+def _cleanup(app, transaction_ids):
+    from app import db
+    from app.models import Transaction
+    with app.app_context():
+        for start in range(0, len(transaction_ids), 500):
+            for transaction in Transaction.query.filter(Transaction.id.in_(transaction_ids[start:start + 500])):
+                db.session.delete(transaction)
+            db.session.commit()
+
+def main(argv=None):
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='tiny')
+    parser.add_argument('--db', default=None, help='SQLite file to seed/reuse (default bench_<scale>.db)')
+    parser.add_argument('--reseed', action='store_true', help='drop and re-seed the database')
+    parser.add_argument('--writers', type=int, default=4, help='writer threads')
+    parser.add_argument('--readers', type=int, default=8, help='reader threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run')
+    parser.add_argument('--profile', default='default', help='DATABASE_PROFILE to benchmark')
+    parser.add_argument('--no-cache', action='store_true', help='disable the per-user response cache')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+    if args.db is None:
+        args.db = f'bench_{args.scale}.db'
+    # _prepare_database reads the row-count overrides of benchmarks.run
+    args.users = args.transactions = args.habit_logs = None
+    args.heavy_share = 0.1
+
+    rng = random.Random(args.seed)
+    app = _build_app(args.db, use_cache=not args.no_cache, profile=args.profile)
+    sizes, counts = _prepare_database(app, args)
+    accounts = _accounts(app, args.writers + args.readers, rng)
+
+    # Logins are not timed: the clock starts once every thread has logged in
+    deadline = [None]
+    ready = threading.Barrier(len(accounts),
+                              action=lambda: deadline.__setitem__(0, time.perf_counter() + args.duration))
+    workers = [_Worker('writer' if i < args.writers else 'reader', app, email, category_id,
+                       deadline, ready, args.seed + i)
+               for i, (email, category_id) in enumerate(accounts)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    results = {
+        'writers': _summarize([w for w in workers if w.role == 'writer'], args.duration),
+        'readers': _summarize([w for w in workers if w.role == 'reader'], args.duration)
+    }
+    print(f"{'role':<10}{'threads':>8}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}  status")
+    for role, result in results.items():
+        print(f"{role:<10}{result['threads']:>8}{result.get('throughput_rps', 0):>10.1f}"
+              f"{result.get('p50_ms', 0):>10.2f}{result.get('p95_ms', 0):>10.2f}{result.get('p99_ms', 0):>10.2f}"
+              f"  {result['status_codes']}")
+
+    _cleanup(app, [tid for worker in workers for tid in worker.created])
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'scale': args.scale,
+            'sizes': sizes,
+            'row_counts': counts,
+            'profile': args.profile,
+            'duration_s': args.duration,
+            'response_cache': not args.no_cache,
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+    return report
+
+if __name__ == '__main__':
+    sys.exit(main() and 0)
@@ -0,0 +1,129 @@
+"""Time and memory of loading a large transaction list through the ORM vs Core.
+
+    python -m benchmarks.readpath --scale medium --rows 100000
+
+Loads ``--rows`` transactions of the heavy benchmark user, with their
+categories, three ways: ORM instances with ``joinedload`` (how the list pages
+used to load), Core rows from ``app.readpath``, and those rows turned into
+``__slots__`` records. Time is the best of ``--repeat`` runs; peak memory is
+measured with ``tracemalloc`` in a separate run, and ``tracked`` is the size of
+the session's identity map afterwards. The heavy user owns a tenth of the
+transactions, so 100k rows needs ``--scale medium``.
+"""
+import argparse
+from datetime import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from benchmarks.run import _build_app, _prepare_database
+
+def _orm(user_id, limit):
+    from sqlalchemy.orm import joinedload
+    from app.models import Transaction
+    return Transaction.query.filter_by(user_id=user_id)\
+        .options(joinedload(Transaction.category))\
+        .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())\
+        .limit(limit).all()
+
+def _statement(user_id, limit):
+    from app import readpath
+    from app.models import Transaction
+    return readpath.transactions_select(user_id)\
+        .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())\
+        .limit(limit)
+
+def _core_rows(user_id, limit):
+    from app import readpath
+    return readpath.fetch_all(_statement(user_id, limit))
+
+def _core_records(user_id, limit):
+    from app import readpath
+    return readpath.transaction_records(readpath.fetch_all(_statement(user_id, limit)))
+
+def _reset():
+    from app import db
+    db.session.expunge_all()
+    gc.collect()
+
+def _timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        _reset()
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+        del result
+    return min(timings)
+
+def _peak(func):
+    from app import db
+    _reset()
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return len(result), peak, len(db.session.identity_map)
+
+def main(argv=None):
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='medium')
+    parser.add_argument('--db', default=None, help='SQLite file to seed/reuse (default bench_<scale>.db)')
+    parser.add_argument('--reseed', action='store_true', help='drop and re-seed the database')
+    parser.add_argument('--rows', type=int, default=100_000, help='transactions to load')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+    if args.db is None:
+        args.db = f'bench_{args.scale}.db'
+    args.users = args.transactions = args.habit_logs = None
+    args.heavy_share = 0.1
+
+    app = _build_app(args.db)
+    sizes, counts = _prepare_database(app, args)
+
+    from app.models import User
+    results = {}
+    with app.app_context():
+        user_id = User.query.filter_by(username='bench_user_0').first().id
+        variants = {
+            'orm_joinedload': lambda: _orm(user_id, args.rows),
+            'core_rows': lambda: _core_rows(user_id, args.rows),
+            'core_records': lambda: _core_records(user_id, args.rows),
+        }
+
+        print(f"{'variant':<18}{'rows':>8}{'ms':>10}{'peak MiB':>10}{'tracked':>9}")
+        for name, load in variants.items():
+            rows, peak, tracked = _peak(load)
+            elapsed = _timed(load, args.repeat)
+            results[name] = {
+                'rows': rows,
+                'ms': round(elapsed * 1000, 2),
+                'peak_bytes': peak,
+                'tracked': tracked
+            }
+            print(f'{name:<18}{rows:>8}{elapsed * 1000:>10.1f}{peak / 2 ** 20:>10.1f}{tracked:>9}')
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'scale': args.scale,
+            'sizes': sizes,
+            'row_counts': counts,
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+    return report
+
+if __name__ == '__main__':
+    sys.exit(main() and 0)
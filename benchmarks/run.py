@@ -0,0 +1,267 @@
+"""Endpoint benchmarks driven through the Flask test client.
+
+    python -m benchmarks.run --scale small --output before.json
+    python -m benchmarks.run --scale small --output after.json
+    python -m benchmarks.compare before.json after.json
+
+The database is seeded on first use (or with ``--reseed``) and reused by later
+runs against the same ``--db`` file. Each scenario reports p50/p95/p99 latency,
+statements per request (from the ``X-Query-Count`` header) and the peak Python
+memory allocated while serving one extra request under ``tracemalloc``.
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+SCENARIOS = {}
+
+def scenario(name, weight=1.0):
+    """Register a scenario; ``weight`` scales the number of timed requests."""
+    def register(func):
+        SCENARIOS[name] = (func, weight)
+        return func
+    return register
+
+@scenario('dashboard')
+def _dashboard(ctx):
+    return ctx.client.get('/dashboard')
+
+@scenario('api_transactions')
+def _api_transactions(ctx):
+    return ctx.client.get('/api/transactions?per_page=20')
+
+@scenario('api_transactions_deep_page')
+def _api_transactions_deep(ctx):
+    return ctx.client.get(f'/api/transactions?per_page=20&cursor={ctx.cursor_after(20 * 499)}')
+
+@scenario('transactions_summary')
+def _transactions_summary(ctx):
+    return ctx.client.get('/transactions/summary')
+
+@scenario('transactions_export', weight=0.1)
+def _transactions_export(ctx):
+    response = ctx.client.get('/transactions/export')
+    response.get_data()
+    return response
+
+@scenario('habit_checkin')
+def _habit_checkin(ctx):
+    habit_id = ctx.rng.choice(ctx.habit_ids)
+    response = ctx.client.post(f'/api/habits/{habit_id}/checkin', json={'date': date.today().isoformat()})
+    ctx.undo_checkin(habit_id)
+    return response
+
+@scenario('habit_batch_checkin')
+def _habit_batch_checkin(ctx):
+    response = ctx.client.post('/api/habits/checkins',
+                               json={'checkins': [{'habit_id': habit_id} for habit_id in ctx.habit_ids]})
+    for habit_id in ctx.habit_ids:
+        ctx.undo_checkin(habit_id)
+    return response
+
+@scenario('habit_calendar')
+def _habit_calendar(ctx):
+    return ctx.client.get('/habits/calendar')
+
+@scenario('habit_calendar_data')
+def _habit_calendar_data(ctx):
+    end = date.today()
+    return ctx.client.get(f'/api/habits/calendar?start={(end - timedelta(days=364)).isoformat()}&end={end.isoformat()}')
+
+class _UserContext:
+    def __init__(self, app, client, user_id, habit_ids, rng):
+        self.app = app
+        self.client = client
+        self.user_id = user_id
+        self.habit_ids = habit_ids
+        self.rng = rng
+        self._cursors = {}
+
+    def cursor_after(self, offset):
+        """Cursor for the page starting after ``offset`` rows (computed once, untimed)."""
+        if offset not in self._cursors:
+            from app.models import Transaction
+            from app.pagination import encode_cursor
+            with self.app.app_context():
+                row = Transaction.query.with_entities(Transaction.transaction_date, Transaction.id)\
+                    .filter_by(user_id=self.user_id)\
+                    .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())\
+                    .offset(offset - 1).first()
+            self._cursors[offset] = encode_cursor(tuple(row), 'next') if row else ''
+        return self._cursors[offset]
+
+    def undo_checkin(self, habit_id):
+        from app import db
+        from app.models import Habit, HabitLog
+        with self.app.app_context():
+            log = HabitLog.query.filter_by(habit_id=habit_id, date_completed=date.today()).first()
+            if log is not None:
+                habit = db.session.get(Habit, habit_id)
+                db.session.delete(log)
+                habit.update_streak()
+                db.session.commit()
+
+def _percentiles(samples):
+    if len(samples) == 1:
+        return samples[0], samples[0], samples[0]
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return cuts[49], cuts[94], cuts[98]
+
+def _build_app(db_path, use_cache=True, profile=None):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path)
+    if profile is not None:
+        os.environ['DATABASE_PROFILE'] = profile
+    from app import create_app
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['SQL_INSTRUMENTATION_SAMPLE_RATE'] = 1.0
+    app.config['RESPONSE_CACHE'] = use_cache
+    return app
+
+def _prepare_database(app, args):
+    from app import db
+    from app.models import User
+    from app.schema import upgrade_schema
+    from benchmarks.seed import seed, SCALES
+
+    sizes = dict(SCALES[args.scale])
+    for key in ('users', 'transactions', 'habit_logs'):
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    with app.app_context():
+        if args.reseed:
+            db.drop_all()
+        upgrade_schema()
+        if User.query.first() is None:
+            print(f'Seeding {sizes} into {args.db}')
+            seed(heavy_share=args.heavy_share, **sizes)
+        counts = {table.name: db.session.query(table).count()
+                  for table in db.metadata.sorted_tables}
+    return sizes, counts
+
+def _login_users(app, args, rng):
+    from app.models import User, Habit
+    from benchmarks.seed import BENCH_PASSWORD
+
+    with app.app_context():
+        heavy = User.query.filter_by(username='bench_user_0').first()
+        others = [u for (u,) in User.query.with_entities(User.id)
+                  .filter(User.username != 'bench_user_0').limit(1000)]
+        chosen = [heavy.id] + rng.sample(others, min(args.sample_users - 1, len(others)))
+        users = [(u.id, u.email) for u in User.query.filter(User.id.in_(chosen))]
+        habit_ids = {user_id: [h for (h,) in Habit.query.with_entities(Habit.id)
+                               .filter_by(user_id=user_id, is_active=True)]
+                     for user_id, _ in users}
+
+    contexts = []
+    for user_id, email in users:
+        client = app.test_client()
+        response = client.post('/auth/login', data={'email': email, 'password': BENCH_PASSWORD})
+        if response.status_code != 302:
+            raise SystemExit(f'Login failed for {email}: {response.status_code}')
+        contexts.append(_UserContext(app, client, user_id, habit_ids[user_id], rng))
+    return contexts
+
+def run_scenario(name, func, contexts, requests):
+    latencies = []
+    queries = []
+    statuses = {}
+
+    for ctx in contexts:
+        func(ctx)  # warm-up
+
+    for i in range(requests):
+        ctx = contexts[i % len(contexts)]
+        started = time.perf_counter()
+        response = func(ctx)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        if 'X-Query-Count' in response.headers:
+            queries.append(int(response.headers['X-Query-Count']))
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(contexts[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = _percentiles(latencies)
+    return {
+        'requests': requests,
+        'status_codes': statuses,
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+        'peak_memory_kb': round(peak / 1024, 1)
+    }
+
+def main(argv=None):
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='tiny')
+    parser.add_argument('--users', type=int, help='override the number of seeded users')
+    parser.add_argument('--transactions', type=int, help='override the number of seeded transactions')
+    parser.add_argument('--habit-logs', type=int, help='override the number of seeded habit logs')
+    parser.add_argument('--heavy-share', type=float, default=0.1,
+                        help='fraction of rows owned by bench_user_0 (default 0.1)')
+    parser.add_argument('--db', default=None, help='SQLite file to seed/reuse (default bench_<scale>.db)')
+    parser.add_argument('--reseed', action='store_true', help='drop and re-seed the database')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per scenario')
+    parser.add_argument('--sample-users', type=int, default=5, help='accounts to spread requests over')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='only run the given scenario (repeatable)')
+    parser.add_argument('--no-cache', action='store_true', help='disable the per-user response cache')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+    if args.db is None:
+        args.db = f'bench_{args.scale}.db'
+
+    rng = random.Random(args.seed)
+    app = _build_app(args.db, use_cache=not args.no_cache)
+    sizes, counts = _prepare_database(app, args)
+    contexts = _login_users(app, args, rng)
+
+    results = {}
+    print(f"{'scenario':<28}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>9}{'peak KB':>10}  status")
+    for name in args.scenario or SCENARIOS:
+        func, weight = SCENARIOS[name]
+        requests = max(3, int(args.requests * weight))
+        result = results[name] = run_scenario(name, func, contexts, requests)
+        print(f"{name:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['queries_per_request'] or 0:>9.1f}{result['peak_memory_kb']:>10.0f}  {result['status_codes']}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'scale': args.scale,
+            'sizes': sizes,
+            'row_counts': counts,
+            'requests_per_scenario': args.requests,
+            'sample_users': len(contexts),
+            'response_cache': not args.no_cache,
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+    return report
+
+if __name__ == '__main__':
+    sys.exit(main() and 0)
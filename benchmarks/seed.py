@@ -0,0 +1,177 @@
+"""Synthetic dataset generator for the benchmark suite.
+
+Rows are written with Core ``executemany`` batches rather than the ORM so that
+millions of rows can be seeded in minutes. Derived tables that the ORM session
+hooks normally maintain are rebuilt once at the end.
+
+The first user (``bench_user_0``) is a "heavy" account that receives
+``heavy_share`` of all transactions and habit logs; the rest is spread evenly
+over the other users. Every user's password is ``BENCH_PASSWORD``.
+"""
+from datetime import date, datetime, timedelta
+import random
+import time
+import uuid
+from werkzeug.security import generate_password_hash
+from app import db, ledger, rollups
+from app.models import (User, Goal, Milestone, Category, Transaction, Habit, HabitLog,
+                        GoalStatus, TransactionType, HabitFrequency)
+
+BENCH_PASSWORD = 'bench-password'
+
+SCALES = {
+    'tiny': dict(users=20, transactions=5_000, habit_logs=2_000),
+    'small': dict(users=200, transactions=100_000, habit_logs=50_000),
+    'medium': dict(users=2_000, transactions=1_000_000, habit_logs=500_000),
+    'large': dict(users=10_000, transactions=5_000_000, habit_logs=2_000_000),
+}
+
+CATEGORIES = [
+    ('Food & Dining', '#EF4444', TransactionType.EXPENSE),
+    ('Transportation', '#3B82F6', TransactionType.EXPENSE),
+    ('Shopping', '#8B5CF6', TransactionType.EXPENSE),
+    ('Entertainment', '#F59E0B', TransactionType.EXPENSE),
+    ('Bills & Utilities', '#6B7280', TransactionType.EXPENSE),
+    ('Salary', '#22C55E', TransactionType.INCOME),
+    ('Freelance', '#84CC16', TransactionType.INCOME),
+]
+
+HABITS_PER_USER = 5
+GOALS_PER_USER = 4
+MILESTONES_PER_GOAL = 4
+BATCH_SIZE = 10_000
+HISTORY_DAYS = 5 * 365
+
+def _new_id():
+    return str(uuid.uuid4())
+
+def _split(total, users, heavy_share):
+    """How many rows each user gets, with user 0 taking ``heavy_share``."""
+    if users == 1:
+        return [total]
+    heavy = int(total * heavy_share)
+    rest, remainder = divmod(total - heavy, users - 1)
+    return [heavy] + [rest + (1 if i < remainder else 0) for i in range(users - 1)]
+
+class _Writer:
+    """Buffers rows per table and flushes them in ``executemany`` batches."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.buffers = {}
+        self.counts = {}
+
+    def add(self, table, row):
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        # Buffers are kept in first-seen order, which is parents before children
+        for table, rows in self.buffers.items():
+            if rows:
+                self.connection.execute(table.insert(), rows)
+                self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+                self.buffers[table] = []
+
+def seed(users, transactions, habit_logs, heavy_share=0.1, seed_value=42, echo=print):
+    """Populate the current app's (empty) database. Returns row counts per table."""
+    rng = random.Random(seed_value)
+    today = date.today()
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    started = time.perf_counter()
+
+    transaction_split = _split(transactions, users, heavy_share)
+    log_split = _split(habit_logs, users, heavy_share)
+
+    connection = db.session.connection()
+    writer = _Writer(connection)
+
+    for index in range(users):
+        user_id = _new_id()
+        writer.add(User.__table__, {
+            'id': user_id,
+            'username': f'bench_user_{index}',
+            'email': f'bench_user_{index}@example.com',
+            'password_hash': password_hash,
+            'created_at': now
+        })
+
+        categories = []
+        for name, color, transaction_type in CATEGORIES:
+            category_id = _new_id()
+            categories.append((category_id, transaction_type))
+            writer.add(Category.__table__, {
+                'id': category_id, 'user_id': user_id, 'name': name, 'color': color,
+                'icon': '📊', 'is_default': True, 'created_at': now
+            })
+        income_categories = [c for c, t in categories if t == TransactionType.INCOME]
+        expense_categories = [c for c, t in categories if t == TransactionType.EXPENSE]
+
+        # Roughly one income per six expenses, sized so balances stay positive
+        for _ in range(transaction_split[index]):
+            is_income = rng.random() < 0.15
+            day = today - timedelta(days=rng.randrange(HISTORY_DAYS))
+            writer.add(Transaction.__table__, {
+                'id': _new_id(),
+                'user_id': user_id,
+                'category_id': rng.choice(income_categories if is_income else expense_categories),
+                'amount': round(rng.uniform(800, 6000) if is_income else rng.uniform(5, 300), 2),
+                'type': TransactionType.INCOME if is_income else TransactionType.EXPENSE,
+                'description': 'Benchmark income' if is_income else 'Benchmark expense',
+                'transaction_date': day,
+                'created_at': datetime.combine(day, datetime.min.time())
+            })
+
+        for g in range(GOALS_PER_USER):
+            goal_id = _new_id()
+            completed = rng.randrange(MILESTONES_PER_GOAL + 1)
+            writer.add(Goal.__table__, {
+                'id': goal_id, 'user_id': user_id, 'title': f'Goal {g}',
+                'description': 'Benchmark goal', 'target_date': today + timedelta(days=rng.randrange(365)),
+                'status': GoalStatus.COMPLETED if completed == MILESTONES_PER_GOAL else GoalStatus.ACTIVE,
+                'progress_percentage': int(completed / MILESTONES_PER_GOAL * 100),
+                'milestone_total': MILESTONES_PER_GOAL,
+                'milestone_completed': completed,
+                'created_at': now, 'updated_at': now
+            })
+            for m in range(MILESTONES_PER_GOAL):
+                writer.add(Milestone.__table__, {
+                    'id': _new_id(), 'goal_id': goal_id, 'title': f'Milestone {m}',
+                    'target_date': today + timedelta(days=30 * m), 'is_completed': m < completed,
+                    'completed_at': now if m < completed else None, 'created_at': now
+                })
+
+        logs_per_habit = _split(log_split[index], HABITS_PER_USER, 1 / HABITS_PER_USER)
+        for h in range(HABITS_PER_USER):
+            habit_id = _new_id()
+            writer.add(Habit.__table__, {
+                'id': habit_id, 'user_id': user_id, 'name': f'Habit {h}',
+                'description': 'Benchmark habit', 'frequency': HabitFrequency.DAILY,
+                'target_count': 1, 'current_streak': 0, 'longest_streak': 0,
+                'is_active': True, 'created_at': now
+            })
+            # Walk back from yesterday, skipping ~20% of days, so today stays free for check-ins
+            day = today - timedelta(days=1)
+            for _ in range(logs_per_habit[h]):
+                if rng.random() < 0.2:
+                    day -= timedelta(days=1)
+                writer.add(HabitLog.__table__, {
+                    'id': _new_id(), 'habit_id': habit_id, 'date_completed': day, 'created_at': now
+                })
+                day -= timedelta(days=1)
+
+        if (index + 1) % 500 == 0:
+            echo(f'  seeded {index + 1}/{users} users ({time.perf_counter() - started:.0f}s)')
+
+    writer.flush()
+    db.session.commit()
+
+    echo('  rebuilding derived tables...')
+    ledger.reconcile(fix=True)
+    rollups.rebuild()
+
+    echo(f'  seeding finished in {time.perf_counter() - started:.1f}s')
+    return writer.counts
@@ -0,0 +1,131 @@
+"""Serialization throughput for API list payloads.
+
+    python -m benchmarks.serialization --scale small --rows 10000
+
+Takes ``--rows`` transactions of the heavy benchmark user and times turning
+them into JSON-ready dicts three ways: ORM instances with a hand-written dict
+per row (how ``/api/transactions`` used to work), the compiled serializer
+with the default fields, and the compiled serializer with a sparse fieldset.
+Each is timed for the query plus serialization and for serialization alone,
+best of ``--repeat`` runs.
+"""
+import argparse
+from datetime import datetime
+import json
+import platform
+import sys
+import time
+from benchmarks.run import _build_app, _prepare_database
+
+def _orm_rows(user_id, limit):
+    from sqlalchemy.orm import joinedload
+    from app.models import Transaction
+    return Transaction.query.filter_by(user_id=user_id)\
+        .options(joinedload(Transaction.category))\
+        .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())\
+        .limit(limit).all()
+
+def _orm_dump(transactions):
+    return [{
+        'id': t.id,
+        'amount': float(t.amount),
+        'type': t.type.value,
+        'category': {
+            'id': t.category.id,
+            'name': t.category.name,
+            'color': t.category.color,
+            'icon': t.category.icon
+        },
+        'description': t.description,
+        'transaction_date': t.transaction_date.isoformat(),
+        'created_at': t.created_at.isoformat()
+    } for t in transactions]
+
+def _compiled_rows(selection, user_id, limit):
+    from app import readpath
+    from app.models import Transaction
+    return readpath.fetch_all(selection.statement().where(Transaction.user_id == user_id)
+                              .order_by(Transaction.transaction_date.desc(), Transaction.id.desc())
+                              .limit(limit))
+
+def _best(func, repeat):
+    from app import db
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main(argv=None):
+    from benchmarks.seed import SCALES
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--db', default=None, help='SQLite file to seed/reuse (default bench_<scale>.db)')
+    parser.add_argument('--reseed', action='store_true', help='drop and re-seed the database')
+    parser.add_argument('--rows', type=int, default=10_000, help='rows per payload')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fields', default='id,amount,transaction_date',
+                        help='sparse fieldset to compare against the defaults')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+    if args.db is None:
+        args.db = f'bench_{args.scale}.db'
+    args.users = args.transactions = args.habit_logs = None
+    args.heavy_share = 0.1
+
+    app = _build_app(args.db)
+    sizes, counts = _prepare_database(app, args)
+
+    from app import serializers
+    from app.models import User
+    results = {}
+    with app.app_context():
+        user_id = User.query.filter_by(username='bench_user_0').first().id
+        serializer = serializers.transactions
+        default = serializer.select()
+        sparse = serializer.select(serializer.parse(args.fields))
+        variants = {
+            'orm_handwritten': (lambda: _orm_rows(user_id, args.rows), _orm_dump),
+            'compiled_default': (lambda: _compiled_rows(default, user_id, args.rows), default.dump),
+            'compiled_sparse': (lambda: _compiled_rows(sparse, user_id, args.rows), sparse.dump),
+        }
+
+        print(f"{'variant':<20}{'rows':>8}{'total ms':>10}{'dump ms':>10}{'rows/s (dump)':>16}")
+        for name, (load, dump) in variants.items():
+            total, payload = _best(lambda: dump(load()), args.repeat)
+            rows = load()
+            dump_only, _ = _best(lambda: dump(rows), args.repeat)
+            results[name] = {
+                'rows': len(payload),
+                'total_ms': round(total * 1000, 2),
+                'dump_ms': round(dump_only * 1000, 2),
+                'dump_rows_per_s': round(len(payload) / dump_only) if dump_only else None,
+                'json_bytes': len(json.dumps(payload, separators=(',', ':')))
+            }
+            result = results[name]
+            print(f"{name:<20}{result['rows']:>8}{result['total_ms']:>10.1f}{result['dump_ms']:>10.1f}"
+                  f"{result['dump_rows_per_s']:>16,}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'scale': args.scale,
+            'sizes': sizes,
+            'row_counts': counts,
+            'sparse_fields': args.fields,
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+    return report
+
+if __name__ == '__main__':
+    sys.exit(main() and 0)
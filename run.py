@@ -19,7 +19,8 @@ def make_shell_context():
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        from app.schema import upgrade_schema
+        upgrade_schema()
         
         from app.sample_data import create_sample_data
         if not User.query.first():
@@ -3,20 +3,94 @@
 // Global utilities
 window.SelfFocus = {
     // API helpers
+    // GET responses carrying an ETag are remembered per URL; later calls send
+    // If-None-Match and reuse the stored body when the server answers 304.
+    etagCache: new Map(),
+    
     async apiCall(url, options = {}) {
-        const defaultOptions = {
-            headers: {
-                'Content-Type': 'application/json',
-            }
+        const method = (options.method || 'GET').toUpperCase();
+        const cached = method === 'GET' ? this.etagCache.get(url) : undefined;
+        const headers = {
+            'Content-Type': 'application/json',
+            ...(cached ? { 'If-None-Match': cached.etag } : {}),
+            ...(options.headers || {})
         };
         
-        const response = await fetch(url, { ...defaultOptions, ...options });
+        const response = await fetch(url, { ...options, headers });
+        
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
         
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        return response.json();
+        const data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (method === 'GET' && etag) {
+            this.etagCache.set(url, { etag, data });
+        } else if (method === 'GET') {
+            this.etagCache.delete(url);
+        }
+        return data;
+    },
+
+    // Writes issued within batchWindow ms of each other are sent together as
+    // one best-effort /api/batch request (one round trip, one commit); each
+    // caller still gets its own result. Only endpoints the server lists in
+    // app/batch.py can be batched. GETs and lone calls go through apiCall.
+    batchWindow: 15,
+    batchQueue: [],
+    batchTimer: null,
+    
+    batchCall(url, options = {}) {
+        const method = (options.method || 'GET').toUpperCase();
+        if (method === 'GET') {
+            return this.apiCall(url, options);
+        }
+        
+        return new Promise((resolve, reject) => {
+            this.batchQueue.push({ url, method, options, resolve, reject });
+            if (!this.batchTimer) {
+                this.batchTimer = setTimeout(() => this.flushBatch(), this.batchWindow);
+            }
+        });
+    },
+    
+    async flushBatch() {
+        const queue = this.batchQueue.splice(0, 100);
+        this.batchTimer = this.batchQueue.length ? setTimeout(() => this.flushBatch(), 0) : null;
+        
+        if (queue.length === 1) {
+            const [call] = queue;
+            this.apiCall(call.url, call.options).then(call.resolve, call.reject);
+            return;
+        }
+        
+        try {
+            const response = await this.apiCall('/api/batch', {
+                method: 'POST',
+                body: JSON.stringify({
+                    mode: 'best_effort',
+                    operations: queue.map(call => ({
+                        method: call.method,
+                        url: call.url,
+                        body: call.options.body ? JSON.parse(call.options.body) : undefined
+                    }))
+                })
+            });
+            
+            response.results.forEach((result, i) => {
+                if (result.status < 400) {
+                    queue[i].resolve(result.body);
+                } else {
+                    queue[i].reject(new Error(`HTTP error! status: ${result.status}`));
+                }
+            });
+        } catch (error) {
+            queue.forEach(call => call.reject(error));
+        }
     },
 
     // Alert system
@@ -266,7 +340,7 @@ window.completeMilestone = async function(milestoneId, button) {
     try {
         SelfFocus.setLoading(button, true);
         
-        const response = await SelfFocus.apiCall(`/goals/milestones/${milestoneId}/complete`, {
+        const response = await SelfFocus.batchCall(`/goals/milestones/${milestoneId}/complete`, {
             method: 'POST'
         });
         
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+import pytest
+from app import create_app, db
+from app.models import (User, Goal, Milestone, Category, Transaction, Habit, HabitLog,
+                        TransactionType)
+from app.schema import upgrade_schema
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path / 'test.db'))
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    with app.app_context():
+        upgrade_schema()
+    # Requests must not share an app context (and ``g``) with the test
+    return app
+
+def login(app, user_id):
+    """A test client signed in as ``user_id`` without going through the login form."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user_id
+        session['_fresh'] = True
+    return client
+
+def make_user(app, name, goals=1, milestones=1, transactions=1, habits=1, habit_logs=1):
+    """Create a user with ``goals`` goals of ``milestones`` milestones each,
+    ``transactions`` expenses covered by one income, and ``habits`` daily habits
+    with ``habit_logs`` days each. Returns the user's id."""
+    with app.app_context():
+        return _add_user(name, goals, milestones, transactions, habits, habit_logs)
+
+def _add_user(name, goals, milestones, transactions, habits, habit_logs):
+    user = User(username=name, email=f'{name}@example.com')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.flush()
+
+    salary = Category(user_id=user.id, name='Salary')
+    food = Category(user_id=user.id, name='Food & Dining')
+    db.session.add_all([salary, food])
+    db.session.flush()
+
+    today = date.today()
+    db.session.add(Transaction(user_id=user.id, category_id=salary.id, amount=10 * transactions + 100,
+                               type=TransactionType.INCOME, transaction_date=today))
+    for i in range(transactions):
+        db.session.add(Transaction(user_id=user.id, category_id=food.id, amount=10,
+                                   type=TransactionType.EXPENSE, description=f'Expense {i}',
+                                   transaction_date=today - timedelta(days=i % 90)))
+
+    for g in range(goals):
+        goal = Goal(user_id=user.id, title=f'Goal {g}', target_date=today + timedelta(days=30))
+        db.session.add(goal)
+        db.session.flush()
+        for m in range(milestones):
+            db.session.add(Milestone(goal_id=goal.id, title=f'Milestone {m}', is_completed=m % 2 == 0))
+
+    for h in range(habits):
+        habit = Habit(user_id=user.id, name=f'Habit {h}')
+        db.session.add(habit)
+        db.session.flush()
+        for d in range(habit_logs):
+            db.session.add(HabitLog(habit_id=habit.id, date_completed=today - timedelta(days=d)))
+
+    db.session.commit()
+    return user.id
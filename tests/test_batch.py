@@ -0,0 +1,120 @@
+from decimal import Decimal
+import pytest
+from app import db, ledger, sync
+from app.models import Category, Goal, Milestone, Transaction, TransactionRollup, TransactionType
+from tests.conftest import login, make_user
+
+@pytest.fixture
+def account(app):
+    # Balance 100; one goal with one of its two milestones completed
+    user_id = make_user(app, 'batcher', goals=1, milestones=2, transactions=1)
+    with app.app_context():
+        ids = {
+            'food': Category.query.filter_by(user_id=user_id, name='Food & Dining').one().id,
+            'expense': Transaction.query.filter_by(user_id=user_id, type=TransactionType.EXPENSE).one().id,
+            'milestone': Milestone.query.filter_by(is_completed=False).one().id,
+        }
+    return login(app, user_id), user_id, ids
+
+def _state(app, user_id):
+    """Everything a batch may change, and the derived data kept in step with it."""
+    with app.app_context():
+        income, expenses = ledger.get_totals(user_id)
+        rollups = dict(db.session.query(TransactionRollup.type, db.func.sum(TransactionRollup.total))
+                       .filter_by(user_id=user_id).group_by(TransactionRollup.type))
+        stored = {'transactions': Transaction.query.filter_by(user_id=user_id).count(),
+                  'balance': income - expenses,
+                  'goals': sorted((goal.title, goal.milestone_total, goal.milestone_completed,
+                                   goal.progress_percentage)
+                                  for goal in Goal.query.filter_by(user_id=user_id)),
+                  'completed_milestones': Milestone.query.filter_by(is_completed=True).count(),
+                  'seq': sync.current_seq()}
+
+        # The derived tables must agree with the rows they summarize
+        assert ledger.reconcile(fix=False) == []
+        actual = dict(db.session.query(Transaction.type, db.func.sum(Transaction.amount))
+                      .filter_by(user_id=user_id).group_by(Transaction.type))
+        assert {key: Decimal(str(value)) for key, value in rollups.items()} == \
+               {key: Decimal(str(value)) for key, value in actual.items()}
+        for goal in Goal.query.filter_by(user_id=user_id):
+            milestones = Milestone.query.filter_by(goal_id=goal.id).all()
+            assert goal.milestone_total == len(milestones)
+            assert goal.milestone_completed == sum(1 for m in milestones if m.is_completed)
+        db.session.remove()
+        return stored
+
+def _operations(ids, failing):
+    operations = [
+        {'method': 'POST', 'url': '/api/transactions',
+         'body': {'amount': 30, 'type': 'Expense', 'category_id': ids['food']}},
+        {'method': 'POST', 'url': f"/goals/milestones/{ids['milestone']}/complete"},
+        {'method': 'POST', 'url': '/api/goals', 'body': {'title': 'Batched goal'}},
+    ]
+    operations.insert(failing, {'method': 'PUT', 'url': f"/api/transactions/{ids['expense']}",
+                                'body': {'amount': 500}})
+    return operations
+
+def test_atomic_batch_rolls_back_every_operation(app, account):
+    client, user_id, ids = account
+    before = _state(app, user_id)
+
+    response = client.post('/api/batch', json={'operations': _operations(ids, failing=3)})
+
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body['committed'] is False
+    assert [result['status'] for result in body['results']] == [201, 200, 201, 400]
+    assert _state(app, user_id) == before
+
+def test_atomic_batch_skips_operations_after_the_failure(app, account):
+    client, user_id, ids = account
+    before = _state(app, user_id)
+
+    response = client.post('/api/batch', json={'operations': _operations(ids, failing=1)})
+
+    assert response.status_code == 409
+    assert [result['status'] for result in response.get_json()['results']] == [201, 400, None, None]
+    assert _state(app, user_id) == before
+
+def test_best_effort_batch_commits_the_operations_that_succeeded(app, account):
+    client, user_id, ids = account
+    before = _state(app, user_id)
+
+    response = client.post('/api/batch', json={'operations': _operations(ids, failing=1), 'mode': 'best_effort'})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['committed'] is True
+    assert [result['status'] for result in body['results']] == [201, 400, 200, 201]
+
+    after = _state(app, user_id)
+    assert after['transactions'] == before['transactions'] + 1
+    assert after['balance'] == before['balance'] - 30
+    assert after['completed_milestones'] == before['completed_milestones'] + 1
+    assert after['goals'] == sorted([('Batched goal', 0, 0, 0), ('Goal 0', 2, 2, 100)])
+    assert after['seq'] > before['seq']
+
+    # The session commits normally again once the batch is over
+    response = client.post('/api/goals', json={'title': 'After the batch'})
+    assert response.status_code == 201
+    assert len(_state(app, user_id)['goals']) == 3
+
+def test_batch_refuses_endpoints_outside_the_allowlist(app, account):
+    client, user_id, ids = account
+    before = _state(app, user_id)
+
+    response = client.post('/api/batch', json={'operations': [
+        {'method': 'POST', 'url': '/api/goals', 'body': {'title': 'Not kept'}},
+        {'method': 'GET', 'url': '/api/goals'},
+    ]})
+
+    assert response.status_code == 409
+    assert response.get_json()['results'][1] == {'index': 1, 'status': 400,
+                                                 'body': {'error': 'This operation cannot be batched'}}
+    assert _state(app, user_id) == before
+
+@pytest.mark.parametrize('data', [{}, {'operations': []}, {'operations': [{}]},
+                                  {'operations': [{'url': '/api/goals'}], 'mode': 'eventually'}])
+def test_invalid_batches_are_rejected(app, account, data):
+    client, _, _ = account
+    assert client.post('/api/batch', json=data).status_code == 400
@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import create_mock_engine
+from app import checkins
+from app.database import upsert_insert
+from app.models import Habit, HabitLog
+from tests.conftest import login, make_user
+
+@pytest.mark.parametrize('upsert', [True, False], ids=['on-conflict', 'select-then-insert'])
+def test_batch_checkin_reports_existing_and_repeated_days(app, monkeypatch, upsert):
+    # Databases without ON CONFLICT (MySQL) take the fallback path
+    monkeypatch.setattr(checkins, 'supports_upsert', lambda bind=None: upsert)
+    user_id = make_user(app, 'checker', habits=1, habit_logs=1)
+    with app.app_context():
+        habit_id = Habit.query.filter_by(user_id=user_id).one().id
+    client = login(app, user_id)
+    today = date.today()
+    yesterday = (today - timedelta(days=1)).isoformat()
+
+    response = client.post('/api/habits/checkins', json={'checkins': [
+        {'habit_id': habit_id},
+        {'habit_id': habit_id, 'date': yesterday},
+        {'habit_id': habit_id, 'date': yesterday},
+        {'habit_id': 'missing'},
+    ]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [result['status'] for result in body['results']] == ['exists', 'created', 'duplicate', 'not_found']
+    assert body['habits'][habit_id]['current_streak'] == 2
+
+@pytest.mark.parametrize('dialect', ['sqlite', 'postgresql'])
+def test_upsert_insert_follows_the_dialect(dialect):
+    engine = create_mock_engine(f'{dialect}://', None)
+    statement = upsert_insert(HabitLog.__table__, engine)\
+        .on_conflict_do_nothing(index_elements=['habit_id', 'date_completed'])
+    assert 'ON CONFLICT (habit_id, date_completed) DO NOTHING' in str(statement.compile(engine))
+
+def test_upsert_insert_refuses_dialects_without_on_conflict():
+    with pytest.raises(NotImplementedError):
+        upsert_insert(HabitLog.__table__, create_mock_engine('mysql://', None))
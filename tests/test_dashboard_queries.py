@@ -0,0 +1,21 @@
+from app.instrumentation import query_budget
+from tests.conftest import login, make_user
+
+DASHBOARD_BUDGET = 8
+
+def _render_dashboard(app, user_id):
+    client = login(app, user_id)
+    with query_budget(DASHBOARD_BUDGET, '/dashboard') as stats:
+        response = client.get('/dashboard')
+    assert response.status_code == 200
+    return stats.count
+
+def test_dashboard_query_count_does_not_grow_with_data(app):
+    app.config['RESPONSE_CACHE'] = False
+    small = make_user(app, 'small')
+    large = make_user(app, 'large', goals=20, milestones=5, transactions=300, habits=6, habit_logs=40)
+
+    small_count = _render_dashboard(app, small)
+    large_count = _render_dashboard(app, large)
+
+    assert small_count == large_count <= DASHBOARD_BUDGET
@@ -0,0 +1,51 @@
+from decimal import Decimal
+from app import db, goal_progress, ledger, sync
+from app.models import Goal, Milestone, Transaction, TransactionType, TransactionRollup
+from tests.conftest import make_user
+
+def test_edits_of_expired_rows_keep_derived_data_in_step(app):
+    user_id = make_user(app, 'editor', goals=2, milestones=2, transactions=3)
+    with app.app_context():
+        # Loaded, then expired by a commit before being edited
+        expense = Transaction.query.filter_by(user_id=user_id, type=TransactionType.EXPENSE).first()
+        goals = Goal.query.filter_by(user_id=user_id).order_by(Goal.title).all()
+        milestone = Milestone.query.filter_by(goal_id=goals[0].id, is_completed=True).one()
+        db.session.commit()
+
+        expense.amount = Decimal('25.50')
+        expense.type = TransactionType.INCOME
+        milestone.goal_id = goals[1].id
+        milestone.is_completed = False
+        db.session.commit()
+
+        assert ledger.reconcile(fix=False) == []
+        income, expenses = ledger.get_totals(user_id)
+        assert (income, expenses) == (Decimal('155.50'), Decimal('20.00'))
+        rollup_totals = dict(db.session.query(TransactionRollup.type, db.func.sum(TransactionRollup.total))
+                             .filter_by(user_id=user_id).group_by(TransactionRollup.type))
+        assert rollup_totals == {TransactionType.INCOME: Decimal('155.50'),
+                                 TransactionType.EXPENSE: Decimal('20.00')}
+
+        for goal in Goal.query.filter_by(user_id=user_id):
+            milestones = Milestone.query.filter_by(goal_id=goal.id).all()
+            assert goal.milestone_total == len(milestones)
+            assert goal.milestone_completed == sum(1 for m in milestones if m.is_completed)
+        db.session.remove()
+
+def test_rebuild_journals_only_the_goals_it_repairs(app):
+    user_id = make_user(app, 'drifter', goals=2, milestones=2)
+    with app.app_context():
+        drifted = Goal.query.filter_by(user_id=user_id, title='Goal 0').one().id
+        # Counters that drifted without going through the flush hooks
+        db.session.execute(Goal.__table__.update().where(Goal.id == drifted)
+                           .values(milestone_total=7, progress_percentage=3))
+        db.session.commit()
+        token = sync.current_seq()
+
+        assert goal_progress.rebuild(user_id) == 1
+        changes = sync.changes_since(user_id, token)['changes']['goals']
+        assert [goal['id'] for goal in changes['updated']] == [drifted]
+        assert changes['updated'][0]['milestone_total'] == 2
+
+        assert goal_progress.rebuild() == 0
+        db.session.remove()
@@ -0,0 +1,28 @@
+from app import db, sync
+from app.cache import LocalCache
+from app.models import Goal
+from tests.conftest import login, make_user
+
+def test_etag_follows_the_database_not_the_process(app):
+    user_id = make_user(app, 'tagger', goals=1)
+    client = login(app, user_id)
+
+    first = client.get('/api/goals')
+    etag = first.headers['ETag']
+    assert client.get('/api/goals', headers={'If-None-Match': etag}).status_code == 304
+
+    # A restarted or different worker has no cached state and still agrees
+    app.extensions['response_cache']['backend'] = LocalCache()
+    assert client.get('/api/goals', headers={'If-None-Match': etag}).status_code == 304
+
+    # A write committed elsewhere (another process) only shows up in the database
+    with app.app_context():
+        goal_id = Goal.query.filter_by(user_id=user_id).one().id
+        with db.engine.begin() as connection:
+            connection.execute(Goal.__table__.update().where(Goal.id == goal_id).values(title='Elsewhere'))
+            sync.record(connection, user_id, 'goals', [goal_id])
+
+    changed = client.get('/api/goals', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()[0]['title'] == 'Elsewhere'
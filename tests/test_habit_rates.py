@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+import pytest
+from app import db, habit_refresh
+from app.models import Habit, HabitLog
+from tests.conftest import login, make_user
+
+# Not a rate 3 logs in 30 days can produce: shows where the value came from
+STORED = 42.0
+
+@pytest.fixture
+def refreshed(app):
+    user_id = make_user(app, 'habitual', habits=1, habit_logs=3)
+    with app.app_context():
+        habit_refresh.refresh([user_id])
+        habit = Habit.query.filter_by(user_id=user_id).one()
+        assert habit.stats_date == date.today()
+        assert habit.completion_rate == pytest.approx(10.0)
+        habit.completion_rate = STORED
+        db.session.commit()
+        habit_id = habit.id
+    return login(app, user_id), habit_id
+
+def _api_rate(client):
+    [habit] = client.get('/api/habits?fields=id,completion_rate').get_json()
+    return habit['completion_rate']
+
+def _stats_date(app, habit_id):
+    with app.app_context():
+        return db.session.get(Habit, habit_id).stats_date
+
+def test_current_stored_rate_is_served(app, refreshed):
+    client, habit_id = refreshed
+    assert _api_rate(client) == STORED
+    with app.app_context():
+        assert db.session.get(Habit, habit_id).get_completion_rate() == STORED
+
+def test_checkin_falls_back_to_the_live_rate(app, refreshed):
+    client, habit_id = refreshed
+    yesterday = date.today() - timedelta(days=3)
+    response = client.post(f'/api/habits/{habit_id}/checkin', json={'date': yesterday.isoformat()})
+    assert response.status_code == 200
+    assert _stats_date(app, habit_id) is None
+    assert _api_rate(client) == pytest.approx(4 / 30 * 100)
+
+def test_batch_checkin_falls_back_to_the_live_rate(app, refreshed):
+    client, habit_id = refreshed
+    day = date.today() - timedelta(days=3)
+    response = client.post('/api/habits/checkins', json={'checkins': [{'habit_id': habit_id, 'date': day.isoformat()}]})
+    assert response.get_json()['created'] == 1
+    assert _stats_date(app, habit_id) is None
+    assert _api_rate(client) == pytest.approx(4 / 30 * 100)
+
+def test_removing_a_checkin_falls_back_to_the_live_rate(app, refreshed):
+    client, habit_id = refreshed
+    with app.app_context():
+        log_id = HabitLog.query.filter_by(habit_id=habit_id, date_completed=date.today()).one().id
+    assert client.delete(f'/habits/checkin/{log_id}').status_code == 200
+    assert _stats_date(app, habit_id) is None
+    assert _api_rate(client) == pytest.approx(2 / 30 * 100)
+
+def test_refresh_changes_the_etag_of_moved_streaks(app):
+    user_id = make_user(app, 'streaky', habits=1, habit_logs=3)
+    client = login(app, user_id)
+    with app.app_context():
+        habit_refresh.refresh([user_id])
+        streak = Habit.query.filter_by(user_id=user_id).one().current_streak
+        # A stale stored streak, as left by days without check-ins
+        db.session.execute(Habit.__table__.update().values(current_streak=streak + 5))
+        db.session.commit()
+
+    stale = client.get('/api/habits?fields=id,current_streak')
+    assert stale.get_json()[0]['current_streak'] == streak + 5
+
+    with app.app_context():
+        habit_refresh.refresh([user_id], force=True)
+    fresh = client.get('/api/habits?fields=id,current_streak', headers={'If-None-Match': stale.headers['ETag']})
+    assert fresh.status_code == 200
+    assert fresh.get_json()[0]['current_streak'] == streak
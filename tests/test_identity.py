@@ -0,0 +1,17 @@
+from app import db, identity
+from app.models import User
+from tests.conftest import make_user
+
+def test_rolled_back_savepoint_keeps_earlier_evictions(app):
+    user_id = make_user(app, 'renamed')
+    with app.app_context():
+        assert identity.load_user(user_id).username == 'renamed'
+
+        db.session.get(User, user_id).username = 'new-name'
+        db.session.flush()
+        savepoint = db.session.begin_nested()
+        savepoint.rollback()
+        db.session.commit()
+
+        assert identity.load_user(user_id).username == 'new-name'
+        db.session.remove()
@@ -0,0 +1,27 @@
+import io
+from sqlalchemy.exc import OperationalError
+from app import rollups
+from tests.conftest import login, make_user
+
+CSV = 'Date,Type,Amount,Category,Description\n2024-01-02,expense,12.50,Food & Dining,Lunch\n'
+
+def test_csv_upload_is_retried_when_the_database_is_locked(app, monkeypatch):
+    app.config['SQLITE_BUSY_BACKOFF'] = 0
+    client = login(app, make_user(app, 'importer'))
+    add_rows = rollups.add_rows
+    attempts = []
+
+    def locked_once(connection, rows):
+        attempts.append(len(rows))
+        if len(attempts) == 1:
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        return add_rows(connection, rows)
+
+    monkeypatch.setattr(rollups, 'add_rows', locked_once)
+    response = client.post('/api/transactions/import',
+                           data={'file': (io.BytesIO(CSV.encode()), 'import.csv')})
+
+    assert response.status_code == 201
+    assert response.get_json()['imported'] == 1
+    assert attempts == [1, 1]
+    assert len(client.get('/api/transactions').get_json()['transactions']) == 3
@@ -0,0 +1,43 @@
+import json
+import logging
+import threading
+from sqlalchemy import text
+from app import db
+from app.instrumentation import query_budget
+from tests.conftest import login, make_user
+
+def test_query_budget_ignores_other_threads(app):
+    started, finished = threading.Event(), threading.Event()
+
+    def other_thread():
+        started.wait()
+        with app.app_context():
+            for _ in range(5):
+                db.session.execute(text('SELECT 1'))
+        finished.set()
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+    with app.app_context(), query_budget(1) as stats:
+        db.session.execute(text('SELECT 1'))
+        started.set()
+        finished.wait()
+    thread.join()
+
+    assert stats.count == 1
+
+def test_streamed_response_is_logged_after_its_body(app, caplog):
+    user_id = make_user(app, 'exporter', transactions=20)
+    client = login(app, user_id)
+
+    with caplog.at_level(logging.INFO, logger='app.sql'):
+        response = client.get('/transactions/export')
+        assert response.is_streamed
+        assert not caplog.records
+        response.get_data()
+        response.close()
+
+    [record] = caplog.records
+    logged = json.loads(record.getMessage())
+    assert logged['endpoint'] == 'transactions.export_transactions'
+    assert logged['query_count'] > int(response.headers['X-Query-Count'])
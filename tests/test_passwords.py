@@ -0,0 +1,12 @@
+import pytest
+from werkzeug.security import generate_password_hash
+from app import passwords
+
+@pytest.mark.parametrize('method', ['pbkdf2:sha256:1000', 'pbkdf2:sha256', 'pbkdf2', 'scrypt:1024:8:1'])
+def test_hash_made_with_the_configured_method_is_kept(method):
+    assert not passwords.needs_rehash(generate_password_hash('secret', method=method), method)
+
+def test_hash_made_with_other_parameters_is_replaced():
+    stored = generate_password_hash('secret', method='pbkdf2:sha256:1000')
+    assert passwords.needs_rehash(stored, 'pbkdf2:sha256:2000')
+    assert passwords.needs_rehash(stored, 'scrypt:1024:8:1')
@@ -0,0 +1,14 @@
+from app import db
+from app.models import User
+from app.schema import PLAN_CHECK_URLS, check_query_plans
+from benchmarks.seed import SCALES, seed
+
+def test_hot_routes_use_indexes(app):
+    with app.app_context():
+        seed(**SCALES['tiny'], echo=lambda message: None)
+        user = User.query.filter_by(username='bench_user_0').one()
+        offenders = check_query_plans(user)
+        db.session.remove()
+
+    assert {'/dashboard', '/transactions/summary', '/api/transactions', '/api/sync?since=0'} <= set(PLAN_CHECK_URLS)
+    assert offenders == []
@@ -0,0 +1,32 @@
+import pytest
+from app import db, sync
+from app.models import Goal
+from tests.conftest import login, make_user
+
+@pytest.mark.parametrize('upsert', [True, False], ids=['on-conflict', 'update-then-insert'])
+def test_sync_returns_changes_since_the_token(app, monkeypatch, upsert):
+    # Databases without ON CONFLICT (MySQL) take the fallback path
+    monkeypatch.setattr(sync, 'supports_upsert', lambda bind=None: upsert)
+    user_id = make_user(app, 'syncer', goals=2)
+    client = login(app, user_id)
+
+    snapshot = client.get('/api/sync').get_json()
+    assert len(snapshot['changes']['goals']['inserted']) == 2
+
+    # The goals already have journal rows, so these writes update them
+    with app.app_context():
+        goal = Goal.query.filter_by(user_id=user_id, title='Goal 0').one()
+        goal.title = 'Renamed'
+        goal_id = goal.id
+        db.session.delete(Goal.query.filter_by(user_id=user_id, title='Goal 1').one())
+        db.session.commit()
+
+    delta = client.get(f"/api/sync?since={snapshot['token']}").get_json()
+    goals = delta['changes']['goals']
+    assert [goal['title'] for goal in goals['updated']] == ['Renamed']
+    assert goals['updated'][0]['id'] == goal_id
+    assert len(goals['deleted']) == 1
+    assert goals['inserted'] == []
+
+    again = client.get(f"/api/sync?since={delta['token']}").get_json()
+    assert again['changes']['goals'] == {'inserted': [], 'updated': [], 'deleted': []}
@@ -0,0 +1,47 @@
+import pytest
+from app import ledger
+from app.models import Transaction, TransactionType
+from tests.conftest import login, make_user
+
+@pytest.fixture
+def account(app):
+    # Income of 110, one expense of 10: balance 100
+    user_id = make_user(app, 'spender', transactions=1)
+    with app.app_context():
+        expense = Transaction.query.filter_by(user_id=user_id, type=TransactionType.EXPENSE).one()
+        income = Transaction.query.filter_by(user_id=user_id, type=TransactionType.INCOME).one()
+        ids = {'expense': expense.id, 'income': income.id}
+    return login(app, user_id), user_id, ids
+
+def _balance(app, user_id):
+    with app.app_context():
+        income, expenses = ledger.get_totals(user_id)
+        return income - expenses
+
+@pytest.mark.parametrize('body', [
+    {'amount': 'ten'}, {'amount': None}, {'amount': 'NaN'}, {'amount': -5}, {'amount': 0},
+    {'amount': 1e12}, {'type': 'Gift'}, {'transaction_date': '2024-13-01'},
+])
+def test_update_rejects_invalid_values(app, account, body):
+    client, user_id, ids = account
+    response = client.put(f"/api/transactions/{ids['expense']}", json=body)
+    assert response.status_code == 400
+    assert _balance(app, user_id) == 100
+
+@pytest.mark.parametrize('transaction, body', [
+    ('expense', {'amount': 110.01}),
+    ('income', {'type': 'Expense'}),
+    ('income', {'amount': 9}),
+])
+def test_update_may_not_overdraw(app, account, transaction, body):
+    client, user_id, ids = account
+    response = client.put(f'/api/transactions/{ids[transaction]}', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Insufficient funds. Current balance: $100.00'
+    assert _balance(app, user_id) == 100
+
+def test_update_within_the_balance(app, account):
+    client, user_id, ids = account
+    response = client.put(f"/api/transactions/{ids['expense']}", json={'amount': '110.00'})
+    assert response.status_code == 200
+    assert _balance(app, user_id) == 0